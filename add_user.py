@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 import os
+import csv
 import json
+import argparse
 from getpass import getpass
 
 from werkzeug.security import generate_password_hash
 
+from basecamp_locking import atomic_write, file_lock
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 USERS_FILE = os.path.join(BASE_DIR, "users.json")
 
+ROLES = ("user", "admin")
+
 
 def load_users():
     if not os.path.exists(USERS_FILE):
@@ -19,12 +25,94 @@ def load_users():
             return {}
 
 
+def _write_users(users):
+    # Temp file + fsync + rename: the app never reads a half-written file
+    atomic_write(USERS_FILE, json.dumps(users, indent=2), mode=0o600)
+
+
 def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+    """Atomically replace users.json under its exclusive lock."""
+    with file_lock(USERS_FILE):
+        _write_users(users)
+
+
+# ───────────── Bulk import ─────────────
+def read_import_file(path):
+    """
+    Read accounts from a CSV (header: username,password[,role]) or JSON file
+    (a list of {"username", "password" or "password_hash", "role"} objects).
+    Raises ValueError for a malformed entry or a username given twice with
+    different details; exact repeats are imported once.
+    """
+    with open(path, "r", newline="") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError("JSON import must be a list of user objects")
+        else:
+            rows = list(csv.DictReader(f))
+
+    accounts = []
+    seen = {}
+    for line, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"entry {line}: expected an object, got {type(row).__name__}")
+        fields = {}
+        for field in ("username", "password", "password_hash", "role"):
+            value = row.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"entry {line}: {field} must be a string")
+            fields[field] = value or ""
+        username = fields["username"].strip()
+        password = fields["password"]
+        password_hash = fields["password_hash"]
+        role = (fields["role"] or "user").strip().lower()
+        if not username:
+            raise ValueError(f"entry {line}: username is empty")
+        if not password and not password_hash:
+            raise ValueError(f"entry {line} ({username}): needs a password or password_hash")
+        if role not in ROLES:
+            raise ValueError(f"entry {line} ({username}): unknown role {role!r}")
+        account = {"username": username, "password": password,
+                   "password_hash": password_hash, "role": role}
+        if username in seen:
+            first_line, first = seen[username]
+            if first != account:
+                raise ValueError(f"entry {line} ({username}): conflicts with entry {first_line}")
+            # Exact repeat; import it once
+            continue
+        seen[username] = (line, account)
+        accounts.append(account)
+    return accounts
+
+
+def import_users(path, update=False):
+    """Add every account in `path` to users.json with a single write."""
+    accounts = read_import_file(path)
+    # Hash outside the lock; hashing hundreds of passwords takes a while
+    hashes = {
+        account["username"]: account["password_hash"] or generate_password_hash(account["password"])
+        for account in accounts
+    }
+
+    added, updated, skipped = [], [], []
+    with file_lock(USERS_FILE):
+        users = load_users()
+        for account in accounts:
+            username = account["username"]
+            if username in users and not update:
+                skipped.append(username)
+                continue
+            (updated if username in users else added).append(username)
+            # Merge, so fields like "name" (which keys exercise history) survive
+            users.setdefault(username, {}).update(password_hash=hashes[username], role=account["role"])
 
+        if added or updated:
+            _write_users(users)
+    return added, updated, skipped
 
-def main():
+
+def add_user_interactive():
     users = load_users()
 
     username = input("New username: ").strip()
@@ -48,20 +136,46 @@ def main():
         return
 
     role = input("Role [user/admin] (default: user): ").strip().lower() or "user"
-    if role not in ("user", "admin"):
+    if role not in ROLES:
         role = "user"
 
-    users[username] = {
-        "password_hash": generate_password_hash(password),
-        "role": role,
-    }
-
-    save_users(users)
+    password_hash = generate_password_hash(password)
+    with file_lock(USERS_FILE):
+        # Re-read under the lock in case the file changed while we prompted
+        users = load_users()
+        if username in users:
+            print(f"User '{username}' already exists.")
+            return
+        users[username] = {
+            "password_hash": password_hash,
+            "role": role,
+        }
+        _write_users(users)
     print(f"User '{username}' added with role '{role}'.")
 
 
-if __name__ == "__main__":
-    main()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add dashboard users to users.json.")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="bulk-add users from a CSV (username,password,role) or JSON file")
+    parser.add_argument("--update", action="store_true",
+                        help="with --import, replace users that already exist instead of skipping them")
+    args = parser.parse_args(argv)
+
+    if not args.import_file:
+        add_user_interactive()
+        return
+
+    try:
+        added, updated, skipped = import_users(args.import_file, update=args.update)
+    except (OSError, ValueError, json.JSONDecodeError) as e:
+        print(f"Import failed, nothing written: {e}")
+        raise SystemExit(1)
 
+    print(f"Added {len(added)}, updated {len(updated)}, skipped {len(skipped)} existing.")
+    if skipped:
+        print("Skipped: " + ", ".join(skipped))
 
 
+if __name__ == "__main__":
+    main()
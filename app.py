@@ -1,20 +1,43 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
-import subprocess
-import glob
+import threading
 
 from datetime import datetime, timedelta  # ← added for timestamps
 
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify  # ← added jsonify
+from flask import Flask, Response, abort, current_app, send_file, render_template, before_render_template, template_rendered, request, redirect, url_for, session, jsonify  # ← added jsonify
 from werkzeug.security import check_password_hash
-import psutil
-import requests
 from exercise_app import exercise_bp
 from basecamp_core import BASE_DIR, LOG_FILE, login_required, admin_required, log_action
-
-app = Flask(__name__)
-app.register_blueprint(exercise_bp, url_prefix="/exercise")
+from basecamp_logs import read_log_entries, parse_cursor, parse_time_bound, format_log_timestamp, audit_writer
+from basecamp_logindex import query_log, count_by as index_count_by
+from basecamp_logdb import AUDIT_BACKEND, audit_db
+from basecamp_analytics import audit_rollups
+from basecamp_assets import static_assets
+from basecamp_compress import compress_response, compression_stats
+from basecamp_fragments import fragment_cache
+from basecamp_perf import perf
+from basecamp_profiler import request_profiler
+from basecamp_locking import file_lock, lock_stats
+from basecamp_nas import NAS_PATH, nas_indexer, format_age
+from basecamp_sampler import stats_sampler
+from basecamp_sensors import sensors
+from basecamp_services import ServiceStatusCache
+from basecamp_collectors import CollectorRegistry
+from basecamp_stream import StatsBroadcaster
+from basecamp_notify import OfficeNotifyClient, NotifySendQueue
+
+# Views are collected here and attached to each app built by create_app()
+ROUTES = []
+
+
+def route(rule, **options):
+    """Like @app.route, but records the view for create_app() to register."""
+    def decorator(view_func):
+        ROUTES.append((rule, view_func, options))
+        return view_func
+    return decorator
 
 
 # ───────────── Services Configuration ─────────────
@@ -24,7 +47,7 @@ SERVICES = [
 ]
 
 # ───────────── Config ─────────────
-app.config["SECRET_KEY"] = os.environ.get("FLASK_SECRET_KEY", "change-me-to-something-random")
+SECRET_KEY = os.environ.get("FLASK_SECRET_KEY", "change-me-to-something-random")
 
 # users.json will live next to this file
 
@@ -32,7 +55,7 @@ USERS_FILE = os.path.join(BASE_DIR, "users.json")
 
 
 # Backup status JSON (written by /usr/local/bin/nas-backup.sh)
-BACKUP_STATUS_FILE = "/var/lib/pinas/backup_status.json"
+BACKUP_STATUS_FILE = os.environ.get("BACKUP_STATUS_FILE", "/var/lib/pinas/backup_status.json")
 
 
 # Tailscale HTTPS host (used when coming in over VPN)
@@ -42,32 +65,56 @@ TAILSCALE_HOST = os.environ.get("TAILSCALE_HOST", "pi-nas.tail6f44bf.ts.net")
 
 
 # ───────────── Office Notify (ESP32-C3) ─────────────
-OFFICE_NOTIFY_BASE = os.environ.get("OFFICE_NOTIFY_BASE", "http://office-notify.local")
-OFFICE_NOTIFY_TIMEOUT = float(os.environ.get("OFFICE_NOTIFY_TIMEOUT", "1.5"))
-
 VALID_OFFICE_MSGS = {"tea", "food", "free", "other"}
 
+office_notify = OfficeNotifyClient()
+office_notify_queue = NotifySendQueue(office_notify)
+
 def office_notify_fetch_status():
     """Return (online_bool, payload_or_none)."""
-    try:
-        r = requests.get(f"{OFFICE_NOTIFY_BASE}/status", timeout=OFFICE_NOTIFY_TIMEOUT)
-        r.raise_for_status()
-        return True, r.json()
-    except Exception:
-        return False, None
+    return office_notify.fetch_status()
 
 
 
 # ───────────── User helpers ─────────────
+_users_lock = threading.Lock()
+_users_cache = {"signature": None, "users": {}}
+
+
+def _users_signature():
+    try:
+        st = os.stat(USERS_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
 def load_users():
-    """Load users from users.json, returns dict like {username: {password_hash: '...', role: 'user'}}"""
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+    """
+    Load users from users.json, returns dict like {username: {password_hash: '...', role: 'user'}}
+
+    The parsed file is cached and only re-read when its inode, mtime or size
+    changes. If a re-read fails to parse, the last good copy is kept.
+    """
+    signature = _users_signature()
+    if signature == _users_cache["signature"]:
+        return _users_cache["users"]
+
+    with _users_lock:
+        if signature == _users_cache["signature"]:
+            return _users_cache["users"]
+        if signature is None:
+            users = {}
+        else:
+            try:
+                with file_lock(USERS_FILE, exclusive=False):
+                    with open(USERS_FILE, "r") as f:
+                        users = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return _users_cache["users"]
+        _users_cache["users"] = users
+        _users_cache["signature"] = signature
+        return users
 
 
 def get_user(username):
@@ -78,35 +125,21 @@ def get_user(username):
 
 
 
-def load_logs(limit=200):
-    """Load the last `limit` log entries, newest first."""
-    if not os.path.exists(LOG_FILE):
-        return []
-
-    try:
-        with open(LOG_FILE, "r") as f:
-            lines = f.readlines()
-    except OSError:
-        return []
-
-    recent_lines = lines[-limit:]
-    entries = []
-    for line in recent_lines:
-        line = line.strip()
-        if not line:
-            continue
-        try:
-            entries.append(json.loads(line))
-        except json.JSONDecodeError:
-            continue
-
-    entries.reverse()  # newest first
+def load_logs(limit=200, before=None):
+    """Load the last `limit` log entries, newest first (older than `before` if given)."""
+    with perf.timer("logs"):
+        if AUDIT_BACKEND == "sqlite":
+            entries, _ = audit_db.query(limit=limit, before=before)
+        else:
+            entries, _ = read_log_entries(LOG_FILE, limit=limit, before=before)
     return entries
 
 
 # ───────────── System Stats Helpers ─────────────
 def get_uptime_and_boot_time():
     """Get system uptime and boot time."""
+    import psutil
+
     try:
         boot_time = datetime.fromtimestamp(psutil.boot_time())
         uptime_seconds = (datetime.now() - boot_time).total_seconds()
@@ -135,11 +168,9 @@ def get_uptime_and_boot_time():
 
 
 def get_cpu_usage():
-    """Get current CPU usage percentage."""
-    try:
-        return round(psutil.cpu_percent(interval=1), 1)
-    except Exception:
-        return None
+    """Get the most recently sampled CPU usage percentage."""
+    sample = stats_sampler.latest()
+    return sample.get("cpu_percent") if sample else None
 
 
 def get_cpu_temperature():
@@ -149,8 +180,8 @@ def get_cpu_temperature():
         temp = None
         temp_c = None
         
-        # Check thermal zones
-        thermal_zones = glob.glob("/sys/class/thermal/thermal_zone*/temp")
+        # Check thermal zones (discovered once, not globbed per call)
+        thermal_zones = sensors.thermal_zones()
         for zone in thermal_zones:
             try:
                 with open(zone, "r") as f:
@@ -169,6 +200,8 @@ def get_cpu_temperature():
         if temp is None:
             # Fallback: try psutil (may not work on all systems)
             try:
+                import psutil
+
                 if hasattr(psutil, "sensors_temperatures"):
                     temps = psutil.sensors_temperatures()
                     if temps:
@@ -205,78 +238,57 @@ def get_cpu_temperature():
         return {"temperature": None, "status": "unknown", "label": "Unknown"}
 
 
-def get_ds18b20_temperature():
-    """Read temperature from DS18B20 sensor."""
+def get_ds18b20_temperatures():
+    """Latest CRC-checked reading for every DS18B20 on the bus: {device_id: celsius}."""
     try:
-        # Find DS18B20 devices (they start with 28-)
-        devices = glob.glob("/sys/bus/w1/devices/28-*/w1_slave")
-        
-        if not devices:
-            return None
-        
-        # Use the first found device
-        device_path = devices[0]
-        
-        with open(device_path, "r") as f:
-            content = f.read()
-            
-        # DS18B20 format: last line contains t=12345 (temperature in millidegrees)
-        if "t=" in content:
-            temp_line = [line for line in content.split("\n") if "t=" in line]
-            if temp_line:
-                temp_raw = temp_line[0].split("t=")[-1].strip()
-                if temp_raw and temp_raw != "":
-                    temp_millidegrees = int(temp_raw)
-                    temp_celsius = temp_millidegrees / 1000.0
-                    return round(temp_celsius, 1)
-        
-        return None
+        return sensors.ds18b20_readings()
     except Exception:
+        return {}
+
+
+def get_ds18b20_temperature():
+    """Case temperature: the first DS18B20 on the bus, or None."""
+    readings = get_ds18b20_temperatures()
+    if not readings:
         return None
+    return next(iter(readings.values()))
 
 
-def get_service_status(service_unit):
-    """Get systemd service status. Returns 'running', 'stopped', or 'unknown'."""
-    try:
-        result = subprocess.run(
-            ["systemctl", "is-active", service_unit],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        
-        status = result.stdout.strip().lower()
-        if status == "active":
-            return "running"
-        elif status in ["inactive", "failed"]:
-            return "stopped"
-        else:
-            return "unknown"
-    except (subprocess.TimeoutExpired, FileNotFoundError, Exception):
-        return "unknown"
+def get_sampled_temperatures():
+    """Return (cpu_temp, case_temp, case_temps) from the latest background sample."""
+    sample = stats_sampler.latest() or {}
+    cpu_temp = sample.get("cpu_temp") or {"temperature": None, "status": "unknown", "label": "Unknown"}
+    return cpu_temp, sample.get("case_temp"), sample.get("case_temps") or {}
+
+
+# Both temperature reads happen on the sampler thread, never in a request
+stats_sampler.register("cpu_temp", get_cpu_temperature)
+stats_sampler.register("case_temp", get_ds18b20_temperature)
+stats_sampler.register("case_temps", get_ds18b20_temperatures)
+
+
+service_status_cache = ServiceStatusCache(SERVICES)
 
 
 def get_all_service_statuses():
-    """Get status for all configured services."""
-    services_status = []
-    for service in SERVICES:
-        status = get_service_status(service["unit"])
-        services_status.append({
-            "label": service["label"],
-            "unit": service["unit"],
-            "status": status
-        })
-    return services_status
+    """Get status for all configured services (one batched, cached systemctl call)."""
+    return service_status_cache.get()
 
 
 
 # ───────────── NAS STORAGE helpers ─────────────
 
 def get_nas_storage_stats():
-    """Return capacity + file-type breakdown for /mnt/nasdata."""
-    path = "/mnt/nasdata"
+    """Return capacity + file-type breakdown for /mnt/nasdata.
+
+    Capacity comes straight from statvfs; the file-type breakdown is read
+    from the background indexer's snapshot, so this never walks the share.
+    """
+    path = NAS_PATH
 
     # Overall disk usage
+    import psutil
+
     try:
         usage = psutil.disk_usage(path)
         total = usage.total
@@ -292,38 +304,12 @@ def get_nas_storage_stats():
             "free": 0,
             "used_percent": 0,
             "file_types": [],
+            "indexed_at": None,
+            "index_age": format_age(None),
         }
 
-    # File-type categories by extension
-    extensions_map = {
-        "video": {".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv"},
-        "music": {".mp3", ".flac", ".wav", ".aac", ".ogg", ".m4a"},
-        "images": {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"},
-        "documents": {".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt", ".py"},
-        "archives": {".zip", ".rar", ".7z", ".tar", ".gz"},
-    }
-
-    type_sizes = {k: 0 for k in extensions_map}
-    type_sizes["other"] = 0
-
-    # Walk the NASDATA tree and sum file sizes by type
-    for root, dirs, files in os.walk(path):
-        for fname in files:
-            ext = os.path.splitext(fname)[1].lower()
-            fpath = os.path.join(root, fname)
-            try:
-                size = os.path.getsize(fpath)
-            except OSError:
-                continue
-
-            matched = False
-            for category, exts in extensions_map.items():
-                if ext in exts:
-                    type_sizes[category] += size
-                    matched = True
-                    break
-            if not matched:
-                type_sizes["other"] += size
+    index = nas_indexer.snapshot()
+    type_sizes = index["totals"]
 
     # Convert to list, sorted, with percentages of USED space
     file_types = []
@@ -347,6 +333,8 @@ def get_nas_storage_stats():
         "free": free,
         "used_percent": round(used / total * 100, 1) if total else 0,
         "file_types": file_types,
+        "indexed_at": index["indexed_at"],
+        "index_age": format_age(index["age_seconds"]),
     }
 
 
@@ -400,9 +388,72 @@ def load_backup_status():
 
 
 
+# ───────────── Stat collectors ─────────────
+# Every dashboard probe, with how long a page will wait for it and how long
+# its result may be reused. A probe that misses its deadline renders stale.
+UNKNOWN_CPU_TEMP = {"temperature": None, "status": "unknown", "label": "Unknown"}
+
+collectors = CollectorRegistry()
+collectors.register("uptime", get_uptime_and_boot_time, timeout=0.5, ttl=30,
+                    default={"uptime": "Unknown", "boot_time": "Unknown"})
+collectors.register("cpu_usage", get_cpu_usage, timeout=0.2)
+collectors.register("cpu_temp", lambda: get_sampled_temperatures()[0], timeout=0.2, default=UNKNOWN_CPU_TEMP)
+collectors.register("case_temp", lambda: get_sampled_temperatures()[1], timeout=0.2)
+collectors.register("case_temps", lambda: get_sampled_temperatures()[2], timeout=0.2, default={})
+collectors.register("services", get_all_service_statuses, timeout=1.0, ttl=5,
+                    default=[{"label": s["label"], "unit": s["unit"], "status": "unknown"} for s in SERVICES])
+# Until the first probe finishes, storage is unknown rather than "not mounted"
+collectors.register("nas_storage", get_nas_storage_stats, timeout=1.0, ttl=10,
+                    default={"unknown": True, "mounted": False, "path": NAS_PATH})
+collectors.register("backup_status", load_backup_status, timeout=0.5, ttl=5, default={})
+
+SYSTEM_STATS_COLLECTORS = ["uptime", "cpu_usage", "cpu_temp", "case_temp", "case_temps", "services"]
+
+# Sections the dashboard can load after the page shell: partial template + collectors
+STATS_SECTIONS = {
+    "status": ("_dashboard_status.html", SYSTEM_STATS_COLLECTORS),
+    "services": ("_dashboard_services.html", ["services"]),
+    "storage": ("_dashboard_storage.html", ["nas_storage"]),
+    "backup": ("_dashboard_backup.html", ["backup_status"]),
+}
+
+# Send the dashboard shell straight away and fetch the stats sections afterwards
+DASHBOARD_PROGRESSIVE = os.environ.get("DASHBOARD_PROGRESSIVE", "1") == "1"
+
+
+def live_stats_snapshot():
+    """Values pushed to /api/stats/stream; only changed keys are sent."""
+    sample = stats_sampler.latest() or {}
+    return {
+        "cpu_usage": sample.get("cpu_percent"),
+        "per_core": sample.get("per_core"),
+        "cpu_temp": sample.get("cpu_temp") or UNKNOWN_CPU_TEMP,
+        "case_temp": sample.get("case_temp"),
+        "case_temps": sample.get("case_temps") or {},
+        "services": {s["unit"]: s["status"] for s in get_all_service_statuses()},
+        "backup_status": load_backup_status(),
+    }
+
+
+stats_broadcaster = StatsBroadcaster(live_stats_snapshot)
+
+
+def stats_template_context(stats, stale):
+    """Template variables for the stats partials, from collectors.collect() output."""
+    context = {"stale": stale}
+    if "uptime" in stats:
+        context["uptime"] = stats["uptime"]["uptime"]
+        context["boot_time"] = stats["uptime"]["boot_time"]
+    for key in ("cpu_usage", "cpu_temp", "case_temp", "case_temps", "services", "nas_storage", "backup_status"):
+        if key in stats:
+            context[key] = stats[key]
+    return context
+
+
+
 
 # ───────────── Routes ─────────────
-@app.route("/login", methods=["GET", "POST"])
+@route("/login", methods=["GET", "POST"])
 def login():
     # If already logged in, skip login page
     if session.get("logged_in"):
@@ -431,7 +482,7 @@ def login():
     return render_template("login.html", error=error)
 
 
-@app.route("/logout")
+@route("/logout")
 def logout():
     username = session.get("username")
     log_action(username, "logout")  # ← log logout
@@ -439,7 +490,7 @@ def logout():
     return redirect(url_for("login"))
 
 
-@app.route("/")
+@route("/")
 @login_required
 def dashboard():
     # Extract just the host part (no port)
@@ -514,37 +565,72 @@ def dashboard():
     if session.get("role") == "admin":
         logs = load_logs(limit=200)
 
-    # Load system stats
-    uptime_data = get_uptime_and_boot_time()
-    cpu_usage = get_cpu_usage()
-    cpu_temp = get_cpu_temperature()
-    case_temp = get_ds18b20_temperature()
-    services = get_all_service_statuses()
+    progressive = request.args.get("progressive", "1" if DASHBOARD_PROGRESSIVE else "0") == "1"
+    # The links card only depends on how the page was reached
+    links_key = (host, on_lan)
+
+    if progressive:
+        # Stats sections are filled in by the page via /api/stats/<section>
+        return render_template(
+            "dashboard.html",
+            links=links,
+            links_key=links_key,
+            logs=logs,
+            progressive=True,
+            nas_storage_json="null",
+            stale=[],
+        )
 
-    # Load NAS storage stats
-    nas_storage = get_nas_storage_stats()
-    
-    # Load backup status
-    backup_status = load_backup_status()
+    # Load system, NAS storage and backup stats in parallel
+    stats, stale = collectors.collect()
 
     return render_template(
         "dashboard.html",
         links=links,
+        links_key=links_key,
         logs=logs,
-        uptime=uptime_data["uptime"],
-        boot_time=uptime_data["boot_time"],
-        cpu_usage=cpu_usage,
-        cpu_temp=cpu_temp,
-        case_temp=case_temp,
-        services=services,
-        nas_storage=nas_storage,
-        nas_storage_json=json.dumps(nas_storage),
-        backup_status=backup_status,
+        progressive=False,
+        nas_storage_json=json.dumps(stats["nas_storage"]),
+        **stats_template_context(stats, stale),
     )
 
 
 
-@app.route("/run-backup", methods=["POST"])
+@route("/api/stats")
+@login_required
+def api_stats():
+    """All dashboard stats as JSON."""
+    stats, stale = collectors.collect()
+    return jsonify({"stats": stats, "stale": stale})
+
+
+@route("/api/stats/stream")
+@login_required
+def api_stats_stream():
+    """Server-Sent Events stream of stat changes, shared by every open tab."""
+    response = Response(stats_broadcaster.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@route("/api/stats/<section>")
+@login_required
+def api_stats_section(section):
+    """One dashboard section as JSON; ?fragment=1 adds its rendered HTML."""
+    if section not in STATS_SECTIONS:
+        return jsonify({"error": "unknown_section"}), 404
+
+    template, names = STATS_SECTIONS[section]
+    stats, stale = collectors.collect(names)
+    payload = {"stats": stats, "stale": stale}
+    if request.args.get("fragment") == "1":
+        payload["html"] = render_template(template, **stats_template_context(stats, stale))
+    return jsonify(payload)
+
+
+
+@route("/run-backup", methods=["POST"])
 @login_required
 @admin_required
 def run_backup():
@@ -553,6 +639,8 @@ def run_backup():
     log_action(username, "manual_backup_triggered")
 
     # Run the backup script in the background so the request returns quickly
+    import subprocess
+
     try:
         subprocess.Popen(["/usr/local/bin/nas-backup.sh"])
     except Exception as e:
@@ -564,7 +652,7 @@ def run_backup():
 
 
 
-@app.route("/logs")
+@route("/logs")
 @login_required
 @admin_required
 def view_logs():
@@ -576,7 +664,119 @@ def view_logs():
     return redirect(url_for("dashboard") + "#logs")
 
 
-@app.route("/log-action", methods=["POST"])
+def log_query_filters():
+    """user/action/since/until from the query string. Raises ValueError on a bad time."""
+    return {
+        "user": request.args.get("user") or None,
+        "action": request.args.get("action") or None,
+        "since": parse_time_bound(request.args["since"]) if request.args.get("since") else None,
+        "until": parse_time_bound(request.args["until"], end=True) if request.args.get("until") else None,
+    }
+
+
+@route("/api/logs")
+@login_required
+@admin_required
+def api_logs():
+    """
+    Page backwards through the audit log: ?limit=N&before=<cursor>, optionally
+    filtered by ?user=, ?action=, ?since= and ?until= (ISO date/time or epoch).
+    """
+    try:
+        limit = max(1, min(int(request.args.get("limit", 200)), 1000))
+        before = request.args.get("before") or None
+        if before:
+            parse_cursor(before)
+    except ValueError:
+        return jsonify({"error": "invalid_cursor"}), 400
+
+    try:
+        filters = log_query_filters()
+    except ValueError:
+        return jsonify({"error": "invalid_time"}), 400
+
+    with perf.timer("logs"):
+        if AUDIT_BACKEND == "sqlite":
+            entries, next_cursor = audit_db.query(limit=limit, before=before, **filters)
+        elif not any(value is not None for value in filters.values()):
+            entries, next_cursor = read_log_entries(LOG_FILE, limit=limit, before=before)
+        else:
+            entries, next_cursor = query_log(limit=limit, before=before, **filters)
+    return jsonify({"entries": entries, "next": next_cursor})
+
+
+@route("/api/logs/summary")
+@login_required
+@admin_required
+def api_logs_summary():
+    """Entry counts grouped by ?by=action|username|day, with the same filters as /api/logs."""
+    field = request.args.get("by", "action")
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 1000))
+        filters = log_query_filters()
+    except ValueError:
+        return jsonify({"error": "invalid_query"}), 400
+
+    try:
+        with perf.timer("logs"):
+            if AUDIT_BACKEND == "sqlite":
+                counts = audit_db.count_by(field, limit=limit, **filters)
+            else:
+                counts = index_count_by(field, limit=limit, **filters)
+    except ValueError:
+        return jsonify({"error": "invalid_field"}), 400
+    return jsonify({"by": field, "counts": [{"value": value, "count": n} for value, n in counts]})
+
+
+@route("/analytics")
+@login_required
+@admin_required
+def analytics():
+    """Admin analytics page, drawn from the audit rollup counters."""
+    summary = audit_rollups.summary()
+    checkpointed = None
+    if summary["checkpointed_at"]:
+        checkpointed = datetime.fromtimestamp(summary["checkpointed_at"]).strftime("%d/%m/%Y %H:%M")
+    return render_template("analytics.html", summary=summary, checkpointed=checkpointed)
+
+
+@route("/api/analytics")
+@login_required
+@admin_required
+def api_analytics():
+    """The analytics summary as JSON."""
+    return jsonify(audit_rollups.summary())
+
+
+@route("/api/logs/writer")
+@login_required
+@admin_required
+def api_log_writer():
+    """Counters for the background audit-log writer (queued/written/dropped)."""
+    return jsonify(audit_writer.stats())
+
+
+@route("/api/locks")
+@login_required
+@admin_required
+def api_locks():
+    """File-lock acquisitions and wait times for this worker process."""
+    return jsonify({"pid": os.getpid(), "locks": lock_stats.snapshot()})
+
+
+@route("/api/compression")
+@login_required
+@admin_required
+def api_compression():
+    """Response compression ratios and template fragment cache hits for this worker."""
+    return jsonify({
+        "pid": os.getpid(),
+        "compression": compression_stats.snapshot(),
+        "fragments": fragment_cache.stats(),
+    })
+
+
+@route("/log-action", methods=["POST"])
 @login_required
 def log_action_endpoint():
     """Endpoint for dashboard JS to log user actions (e.g. link clicks)."""
@@ -596,7 +796,7 @@ def log_action_endpoint():
     return jsonify({"status": "ok"})
 
 
-@app.route("/system-stats")
+@route("/system-stats")
 @login_required
 def system_stats():
     """Display system statistics page."""
@@ -604,24 +804,99 @@ def system_stats():
     log_action(username, "view_system_stats")
     
     # Gather all system stats
-    uptime_data = get_uptime_and_boot_time()
-    cpu_usage = get_cpu_usage()
-    cpu_temp = get_cpu_temperature()
-    case_temp = get_ds18b20_temperature()
-    services = get_all_service_statuses()
+    stats, stale = collectors.collect(SYSTEM_STATS_COLLECTORS)
     
     return render_template("system_stats.html",
-                         uptime=uptime_data["uptime"],
-                         boot_time=uptime_data["boot_time"],
-                         cpu_usage=cpu_usage,
-                         cpu_temp=cpu_temp,
-                         case_temp=case_temp,
-                         services=services)
+                         uptime=stats["uptime"]["uptime"],
+                         boot_time=stats["uptime"]["boot_time"],
+                         cpu_usage=stats["cpu_usage"],
+                         cpu_temp=stats["cpu_temp"],
+                         case_temp=stats["case_temp"],
+                         case_temps=stats["case_temps"],
+                         services=stats["services"],
+                         stale=stale)
 
 
+@route("/perf")
+@login_required
+@admin_required
+def perf_page():
+    """Admin page of request latency percentiles and per-section timings for this worker."""
+    return render_template("perf.html", snapshot=perf.snapshot(),
+                           since=datetime.fromtimestamp(perf.started_at).strftime("%d/%m/%Y %H:%M"))
+
+
+@route("/api/perf")
+@login_required
+@admin_required
+def api_perf():
+    """Latency histograms summarised as p50/p95/p99, per endpoint and per timed section."""
+    return jsonify(perf.snapshot())
+
+
+@route("/api/perf/reset", methods=["POST"])
+@login_required
+@admin_required
+def api_perf_reset():
+    perf.reset()
+    log_action(session.get("username"), "perf_reset")
+    return jsonify({"ok": True})
+
+
+@route("/profiles")
+@login_required
+@admin_required
+def profiles():
+    """Saved request profiles, and the form to profile the next requests to a route."""
+    endpoints = sorted({rule.endpoint for rule in current_app.url_map.iter_rules()} - {"static"})
+    return render_template(
+        "profiles.html",
+        profiles=[
+            {**entry, "modified": datetime.fromtimestamp(entry["modified"]).strftime("%d/%m/%Y %H:%M:%S")}
+            for entry in request_profiler.list()
+        ],
+        armed=request_profiler.armed(),
+        endpoints=endpoints,
+        max_files=request_profiler.max_files,
+    )
+
+
+@route("/profiles/arm", methods=["POST"])
+@login_required
+@admin_required
+def profiles_arm():
+    """Profile the next N requests to an endpoint, in whichever worker serves them."""
+    endpoint = request.form.get("endpoint", "")
+    if endpoint not in {rule.endpoint for rule in current_app.url_map.iter_rules()}:
+        abort(400)
+    try:
+        count = max(0, min(int(request.form.get("count", 1)), 100))
+    except ValueError:
+        abort(400)
+    request_profiler.arm(endpoint, count)
+    log_action(session.get("username"), "profile_arm", {"endpoint": endpoint, "count": count})
+    return redirect(url_for("profiles"))
 
 
-@app.route("/office-notify/status", methods=["GET"])
+@route("/profiles/<name>")
+@login_required
+@admin_required
+def profile_download(name):
+    """A saved profile as a pstats file, or ?format=text for a cumulative-time report."""
+    path = request_profiler.path_for(name)
+    if path is None:
+        abort(404)
+    if request.args.get("format") == "text":
+        sort = request.args.get("sort", "cumulative")
+        if sort not in ("cumulative", "tottime", "calls"):
+            sort = "cumulative"
+        return Response(request_profiler.summary(name, sort=sort), mimetype="text/plain")
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=name)
+
+
+
+
+@route("/office-notify/status", methods=["GET"])
 @login_required
 def office_notify_status():
     username = session.get("username")
@@ -630,7 +905,7 @@ def office_notify_status():
     return jsonify({"online": online, "status": payload})
 
 
-@app.route("/office-notify/send", methods=["POST"])
+@route("/office-notify/send", methods=["POST"])
 @login_required
 def office_notify_send():
     username = session.get("username")
@@ -646,23 +921,66 @@ def office_notify_send():
         log_action(username, "office_notify_send_invalid", {"msg": msg})
         return jsonify({"ok": False, "error": "invalid_msg"}), 400
 
-    try:
-        r = requests.get(
-            f"{OFFICE_NOTIFY_BASE}/notify",
-            params={"msg": msg},
-            timeout=OFFICE_NOTIFY_TIMEOUT
-        )
-        r.raise_for_status()
-        log_action(username, "office_notify_send", {"msg": msg})
-        return jsonify({"ok": True})
-    except Exception as e:
-        log_action(username, "office_notify_send_failed", {"msg": msg, "error": str(e)})
-        return jsonify({"ok": False, "error": "device_unreachable"}), 502
+    record, duplicate = office_notify_queue.submit(msg, username)
+    if record is None:
+        log_action(username, "office_notify_send_dropped", {"msg": msg})
+        return jsonify({"ok": False, "error": "queue_full"}), 503
+
+    log_action(username, "office_notify_send", {"msg": msg, "id": record["id"], "duplicate": duplicate})
+    return jsonify({"ok": True, "id": record["id"], "state": record["state"], "duplicate": duplicate}), 202
+
+
+@route("/office-notify/send/<delivery_id>", methods=["GET"])
+@login_required
+def office_notify_delivery(delivery_id):
+    """Delivery state of a queued office-notify message."""
+    record = office_notify_queue.get(delivery_id)
+    if record is None:
+        return jsonify({"ok": False, "error": "unknown_id"}), 404
+    return jsonify({"ok": True, "delivery": record})
+
+
 
 
 
+# ───────────── App factory ─────────────
+def create_app(config=None):
+    """Build the Flask app. Endpoint names are the view function names, as before."""
+    # static/ is served by static_assets: fingerprinted URLs, ETags, gzip/br variants
+    app = Flask(__name__, static_folder=None)
+    app.config["SECRET_KEY"] = SECRET_KEY
+    if config:
+        app.config.update(config)
+
+    app.register_blueprint(exercise_bp, url_prefix="/exercise")
+    app.add_template_filter(format_log_timestamp, "log_time")
+    app.add_url_rule("/static/<path:filename>", endpoint="static", view_func=static_assets.send)
+    app.url_defaults(static_assets.url_defaults)
+    app.add_template_global(fragment_cache.render, "fragment")
+
+    # after_request hooks run in reverse order: the profiler and perf timings
+    # both cover the other hooks, including compression
+    app.before_request(request_profiler.before_request)
+    app.after_request(request_profiler.after_request)
+    app.teardown_request(request_profiler.teardown_request)
+    app.before_request(perf.before_request)
+    app.after_request(perf.after_request)
+    app.after_request(compress_response)
+    before_render_template.connect(perf.render_started, app, weak=False)
+    template_rendered.connect(perf.render_finished, app, weak=False)
+    for rule, view_func, options in ROUTES:
+        app.add_url_rule(rule, view_func=view_func, **options)
+    return app
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
+    if "--startup-report" in sys.argv:
+        from basecamp_startup import main
+
+        sys.exit(main(sys.argv[1:]))
+    # Development server only; see wsgi.py / gunicorn.conf.py for production
     app.run(host="0.0.0.0", port=8000, debug=True)
 
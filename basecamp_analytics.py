@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from basecamp_locking import atomic_write, file_lock
+from basecamp_threads import ProcessThread
+from basecamp_logs import BASE_DIR, LOG_FILE, parse_log_timestamp, read_log_entries
+
+# Rollup counters, checkpointed here by every worker
+ANALYTICS_FILE = os.environ.get("ANALYTICS_FILE", os.path.join(BASE_DIR, "analytics.json"))
+
+# Seconds between checkpoints (only when something changed)
+ANALYTICS_CHECKPOINT_INTERVAL = float(os.environ.get("ANALYTICS_CHECKPOINT_INTERVAL", "30"))
+
+# Daily buckets older than this are pruned, so the file stays a fixed size
+ANALYTICS_DAYS = int(os.environ.get("ANALYTICS_DAYS", "90"))
+
+# Rows shown per "top" table
+ANALYTICS_TOP = 10
+
+# Keyed counters; each is {key: count}
+COUNTERS = (
+    "events_by_action",
+    "events_by_user",
+    "events_by_hour",
+    "logins_by_day",
+    "failed_logins_by_ip",
+    "link_clicks",
+)
+
+# Counters keyed on a day, pruned after ANALYTICS_DAYS
+DAILY_COUNTERS = ("logins_by_day",)
+
+# Counters keyed on something unbounded (users, IPs, link targets); beyond
+# ANALYTICS_MAX_KEYS the smallest are folded into OTHER_KEY, so totals hold
+CAPPED_COUNTERS = ("events_by_action", "events_by_user", "failed_logins_by_ip", "link_clicks")
+ANALYTICS_MAX_KEYS = int(os.environ.get("ANALYTICS_MAX_KEYS", "500"))
+OTHER_KEY = "(other)"
+
+
+def _empty():
+    return {name: Counter() for name in COUNTERS}
+
+
+def _top(counter, top):
+    """Largest `top` entries, leaving out the folded-in tail."""
+    return [(key, n) for key, n in counter.most_common(top + 1) if key != OTHER_KEY][:top]
+
+
+def rollup_entry(counters, entry):
+    """Add one audit entry to `counters` (a dict of Counters)."""
+    action = entry.get("action")
+    counters["events_by_action"][action or "unknown"] += 1
+    counters["events_by_user"][entry.get("username") or "anonymous"] += 1
+
+    ts = parse_log_timestamp(entry.get("timestamp"))
+    when = datetime.fromtimestamp(ts) if ts is not None else None
+    if when is not None:
+        counters["events_by_hour"][f"{when.hour:02d}"] += 1
+
+    if action == "login" and when is not None:
+        counters["logins_by_day"][when.strftime("%Y-%m-%d")] += 1
+    elif action == "login_failed":
+        counters["failed_logins_by_ip"][entry.get("ip") or "unknown"] += 1
+    elif action == "open_link":
+        target = (entry.get("details") or {}).get("target")
+        if target:
+            counters["link_clicks"][target] += 1
+
+
+class AuditRollups:
+    """
+    Audit-log counters kept up to date as entries are written.
+
+    record() only touches in-memory deltas. A background thread checkpoints
+    them every ANALYTICS_CHECKPOINT_INTERVAL: under a file lock it reads the
+    file, adds this process's deltas and writes it back atomically, so
+    several workers can share one file without losing counts.
+    """
+
+    def __init__(self, path=ANALYTICS_FILE, interval=ANALYTICS_CHECKPOINT_INTERVAL, days=ANALYTICS_DAYS):
+        self.path = path
+        self.interval = interval
+        self.days = days
+        self._lock = threading.Lock()
+        self._delta = _empty()
+        self._base = None
+        # (inode, size, mtime_ns) of the file _base was read from
+        self._base_signature = None
+        self._meta = {}
+        self._dirty = False
+        self._checkpointer = ProcessThread(self._run, "analytics-checkpoint")
+
+    # ───────── Updates ─────────
+    def record(self, entries):
+        """Fold written entries into the counters (used as an audit-writer listener)."""
+        with self._lock:
+            if self._checkpointer.pid != os.getpid():
+                # A forked child must not checkpoint the parent's deltas again
+                self._delta = _empty()
+                self._dirty = False
+            for entry in entries:
+                rollup_entry(self._delta, entry)
+            self._dirty = True
+        self.ensure_running()
+
+    # ───────── Checkpoints ─────────
+    def _read_file(self, f):
+        f.seek(0)
+        try:
+            data = json.loads(f.read() or "{}")
+        except json.JSONDecodeError:
+            data = {}
+        counters = {name: Counter(data.get(name) or {}) for name in COUNTERS}
+        return counters, data.get("meta") or {}
+
+    def _prune(self, counters):
+        cutoff = (datetime.now() - timedelta(days=self.days)).strftime("%Y-%m-%d")
+        for name in DAILY_COUNTERS:
+            counters[name] = Counter({day: n for day, n in counters[name].items() if day >= cutoff})
+        for name in CAPPED_COUNTERS:
+            counter = counters[name]
+            if len(counter) <= ANALYTICS_MAX_KEYS:
+                continue
+            other = counter.pop(OTHER_KEY, 0)
+            kept = Counter(dict(counter.most_common(ANALYTICS_MAX_KEYS - 1)))
+            kept[OTHER_KEY] = other + sum(counter.values()) - sum(kept.values())
+            counters[name] = kept
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _write_file(self, counters, meta):
+        # Caller holds file_lock(self.path)
+        atomic_write(self.path, json.dumps({"meta": meta, **{name: dict(counters[name]) for name in COUNTERS}}))
+
+    def checkpoint(self):
+        """Merge this process's deltas into the file. Returns False if nothing changed."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            delta, self._delta, self._dirty = self._delta, _empty(), False
+
+        try:
+            with file_lock(self.path):
+                try:
+                    with open(self.path, "r") as f:
+                        counters, meta = self._read_file(f)
+                except FileNotFoundError:
+                    counters, meta = _empty(), {}
+                for name in COUNTERS:
+                    counters[name].update(delta[name])
+                self._prune(counters)
+                meta["checkpointed_at"] = time.time()
+                self._write_file(counters, meta)
+                signature = self._signature()
+        except OSError:
+            # Put the deltas back and try again next time
+            with self._lock:
+                for name in COUNTERS:
+                    self._delta[name].update(delta[name])
+                self._dirty = True
+            return False
+
+        with self._lock:
+            self._base, self._meta, self._base_signature = counters, meta, signature
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.checkpoint()
+            except Exception:
+                pass
+
+    def ensure_running(self):
+        """Start the checkpoint thread in this process if it isn't running yet."""
+        self._checkpointer.start()
+
+    # ───────── Reading ─────────
+    def _load_base(self):
+        try:
+            with open(self.path, "r") as f:
+                return self._read_file(f)
+        except FileNotFoundError:
+            return _empty(), {}
+
+    def counters(self):
+        """
+        Checkpointed counters plus this process's not-yet-checkpointed
+        deltas. The file is re-read whenever it changes, so other workers'
+        checkpoints show up here without waiting for our own.
+        """
+        signature = self._signature()
+        if self._base is None or signature != self._base_signature:
+            base, meta = self._load_base()
+            with self._lock:
+                self._base, self._meta, self._base_signature = base, meta, signature
+        with self._lock:
+            merged = {name: self._base[name] + self._delta[name] for name in COUNTERS}
+            meta = dict(self._meta)
+        return merged, meta
+
+    def summary(self, top=ANALYTICS_TOP, days=14):
+        """Everything the analytics page shows; cost depends on counter sizes, not log size."""
+        counters, meta = self.counters()
+        today = datetime.now().date()
+        recent_days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days - 1, -1, -1)]
+        return {
+            "logins_by_day": [(day, counters["logins_by_day"].get(day, 0)) for day in recent_days],
+            "failed_logins_by_ip": _top(counters["failed_logins_by_ip"], top),
+            "link_clicks": _top(counters["link_clicks"], top),
+            "events_by_hour": [(f"{h:02d}", counters["events_by_hour"].get(f"{h:02d}", 0)) for h in range(24)],
+            "top_users": _top(counters["events_by_user"], top),
+            "top_actions": _top(counters["events_by_action"], top),
+            "total_events": sum(counters["events_by_action"].values()),
+            "checkpointed_at": meta.get("checkpointed_at"),
+            "rebuilt_at": meta.get("rebuilt_at"),
+        }
+
+    # ───────── Backfill ─────────
+    def rebuild(self, entries):
+        """Replace the file with counters computed from `entries` (one-off backfill)."""
+        counters = _empty()
+        for entry in entries:
+            rollup_entry(counters, entry)
+        self._prune(counters)
+        meta = {"rebuilt_at": time.time(), "checkpointed_at": time.time()}
+        with file_lock(self.path):
+            self._write_file(counters, meta)
+            signature = self._signature()
+        with self._lock:
+            self._base, self._meta, self._base_signature = counters, meta, signature
+            self._delta, self._dirty = _empty(), False
+        return sum(counters["events_by_action"].values())
+
+
+audit_rollups = AuditRollups()
+
+
+def _iter_all_entries(path):
+    cursor = None
+    while True:
+        entries, cursor = read_log_entries(path, limit=1000, before=cursor)
+        yield from entries
+        if not cursor:
+            break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit-log analytics rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute the rollups from the whole audit log")
+    rebuild.add_argument("--log-file", default=LOG_FILE)
+    sub.add_parser("show", help="print the current summary as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        from basecamp_logdb import AUDIT_BACKEND, audit_db
+
+        if AUDIT_BACKEND == "sqlite":
+            entries = audit_db.iter_entries()
+        else:
+            entries = _iter_all_entries(args.log_file)
+        total = audit_rollups.rebuild(entries)
+        print(f"Rolled up {total} events into {audit_rollups.path}")
+    elif args.command == "show":
+        print(json.dumps(audit_rollups.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import gzip
+import hashlib
+import argparse
+import mimetypes
+import threading
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+from basecamp_compress import load_brotli, negotiate_encoding
+from basecamp_locking import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+
+# Rewritten CSS and the .gz/.br variants; safe to delete, rebuilt on demand
+ASSET_CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", os.path.join(BASE_DIR, ".asset_cache"))
+
+# Cache lifetime for URLs carrying the current ?v= fingerprint
+ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", str(365 * 24 * 3600)))
+
+# Hex digits of the content hash used in ?v= and the ETag
+ASSET_HASH_LENGTH = 12
+
+# Text assets worth precompressing; images, fonts and audio already are
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".json", ".txt", ".html", ".webmanifest")
+
+# Files smaller than this are sent as-is
+ASSET_MIN_COMPRESS_SIZE = 512
+
+# url(...) references inside stylesheets, e.g. url(../webfonts/fa-solid-900.woff2)
+CSS_URL_RE = re.compile(rb"""url\(\s*(['"]?)([^'")?#]+)([^'")]*)\1\s*\)""")
+
+
+class Asset:
+    """One static file: its fingerprint and the files to send for each encoding."""
+
+    def __init__(self, filename, signature, digest, variants, deps):
+        self.filename = filename
+        self.signature = signature
+        self.digest = digest
+        self.variants = variants
+        self.deps = deps
+        self.mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+class StaticAssets:
+    """
+    Content-hashed static files.
+
+    version() gives the fingerprint templates append as ?v=; send() serves
+    a file with an ETag, far-future immutable caching when the fingerprint
+    in the URL is current, and a precompressed variant when the client
+    accepts one. Stylesheets have their url(...) references fingerprinted
+    too, so fonts loaded from CSS are cached the same way.
+
+    Entries are rebuilt when a file's (mtime, size) changes, so editing a
+    file in static/ takes effect without a restart.
+    """
+
+    def __init__(self, static_dir=STATIC_DIR, cache_dir=ASSET_CACHE_DIR):
+        self.static_dir = static_dir
+        self.cache_dir = cache_dir
+        # Re-entrant: building a stylesheet builds the files it references
+        self._lock = threading.RLock()
+        self._assets = {}
+
+    # ───────── Building ─────────
+    def _signature(self, filename):
+        path = safe_join(self.static_dir, filename)
+        if path is None:
+            return None, None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return path, None
+        if not os.path.isfile(path):
+            return path, None
+        return path, (st.st_mtime_ns, st.st_size)
+
+    def _rewrite_css(self, filename, data, deps):
+        base = os.path.dirname(filename)
+
+        def versioned(match):
+            quote, target, suffix = match.groups()
+            text = target.decode("utf-8", "replace")
+            if "://" in text or text.startswith(("/", "data:")):
+                return match.group(0)
+            dep = os.path.normpath(os.path.join(base, text)).replace(os.sep, "/")
+            digest = self.version(dep)
+            if digest is None or suffix:
+                return match.group(0)
+            deps.append((dep, self._assets[dep].signature))
+            return b"url(" + quote + target + b"?v=" + digest.encode() + quote + b")"
+
+        return CSS_URL_RE.sub(versioned, data)
+
+    def _cache_path(self, filename, digest, suffix=""):
+        return os.path.join(self.cache_dir, f"{filename}.{digest}{suffix}")
+
+    def _write_variant(self, path, data):
+        # Named by content hash, so an existing file is already right
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        return path
+
+    def _build(self, filename, path, signature):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        deps = []
+        if filename.endswith(".css"):
+            data = self._rewrite_css(filename, data, deps)
+        digest = hashlib.sha256(data).hexdigest()[:ASSET_HASH_LENGTH]
+
+        variants = {"identity": path}
+        try:
+            if deps:
+                variants["identity"] = self._write_variant(self._cache_path(filename, digest), data)
+            if filename.endswith(COMPRESSIBLE_EXTENSIONS) and len(data) >= ASSET_MIN_COMPRESS_SIZE:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    variants["gzip"] = self._write_variant(self._cache_path(filename, digest, ".gz"), compressed)
+                brotli = load_brotli()
+                if brotli is not None:
+                    compressed = brotli.compress(data, quality=11)
+                    if len(compressed) < len(data):
+                        variants["br"] = self._write_variant(self._cache_path(filename, digest, ".br"), compressed)
+        except OSError:
+            # Read-only checkout: serve what we can straight from static/
+            if deps:
+                return None
+            variants = {"identity": path}
+        return Asset(filename, signature, digest, variants, deps)
+
+    def _current(self, asset):
+        for dep, signature in asset.deps:
+            if self._signature(dep)[1] != signature:
+                return False
+        return True
+
+    def get(self, filename):
+        """The Asset for a path under static/, or None if there is no such file."""
+        path, signature = self._signature(filename)
+        if signature is None:
+            return None
+        asset = self._assets.get(filename)
+        if asset is not None and asset.signature == signature and self._current(asset):
+            return asset
+        with self._lock:
+            asset = self._assets.get(filename)
+            if asset is None or asset.signature != signature or not self._current(asset):
+                asset = self._build(filename, path, signature)
+                if asset is None:
+                    return None
+                self._assets[filename] = asset
+        return asset
+
+    def version(self, filename):
+        """Fingerprint for ?v=, or None if the file doesn't exist."""
+        asset = self.get(filename)
+        return asset.digest if asset is not None else None
+
+    def build(self):
+        """Fingerprint and precompress every file under static/. Returns the Assets."""
+        built = []
+        for root, _, files in os.walk(self.static_dir):
+            for name in sorted(files):
+                filename = os.path.relpath(os.path.join(root, name), self.static_dir).replace(os.sep, "/")
+                asset = self.get(filename)
+                if asset is not None:
+                    built.append(asset)
+        return built
+
+    # ───────── Serving ─────────
+    def send(self, filename):
+        """Response for GET /static/<filename>."""
+        asset = self.get(filename)
+        if asset is None:
+            abort(404)
+
+        available = tuple(encoding for encoding in ("br", "gzip") if encoding in asset.variants)
+        encoding = negotiate_encoding(request.accept_encodings, available) or "identity"
+
+        response = send_file(
+            asset.variants[encoding],
+            mimetype=asset.mimetype,
+            etag=asset.digest if encoding == "identity" else f"{asset.digest}-{encoding}",
+            conditional=True,
+            max_age=None,
+        )
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add("Accept-Encoding")
+
+        if request.args.get("v") == asset.digest:
+            response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+        else:
+            # Unversioned or stale URL: cache, but check the ETag each time
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def url_defaults(self, endpoint, values):
+        """url_defaults hook: url_for('static', filename=...) gets ?v=<fingerprint>."""
+        if endpoint != "static" or "v" in values or "filename" not in values:
+            return
+        digest = self.version(values["filename"])
+        if digest is not None:
+            values["v"] = digest
+
+
+static_assets = StaticAssets()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress static assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="hash every file under static/ and write the compressed variants")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        assets = static_assets.build()
+        compressed = [asset for asset in assets if len(asset.variants) > 1]
+        print(f"Fingerprinted {len(assets)} files, {len(compressed)} with precompressed variants "
+              f"in {static_assets.cache_dir}" + ("" if load_brotli() else " (gzip only; brotli not installed)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from basecamp_perf import perf
+
+COLLECTOR_WORKERS = int(os.environ.get("COLLECTOR_WORKERS", "8"))
+
+
+class _Collector:
+    def __init__(self, name, func, timeout, ttl, default):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.ttl = ttl
+        self.default = default
+        self.value = None
+        self.has_value = False
+        self.fetched_at = 0.0
+        self.future = None
+
+    def fresh(self):
+        return self.has_value and (time.monotonic() - self.fetched_at) < self.ttl
+
+
+class CollectorRegistry:
+    """
+    Named stat probes fanned out on a shared thread pool.
+
+    Every collector has a deadline and a cache TTL. collect() waits at most
+    until each collector's deadline; a probe that misses it keeps running in
+    the background (so the next request can use its result) and the caller
+    gets the last known value, or the collector's default, flagged as stale.
+    """
+
+    def __init__(self, max_workers=COLLECTOR_WORKERS):
+        self.max_workers = max_workers
+        self._collectors = {}
+        # Re-entrant: a done-callback can fire inside _submit if the probe is instant
+        self._lock = threading.RLock()
+        self._executor = None
+        self._pid = None
+
+    def register(self, name, func, timeout=1.0, ttl=0.0, default=None):
+        self._collectors[name] = _Collector(name, func, timeout, ttl, default)
+
+    def names(self):
+        return list(self._collectors)
+
+    def _get_executor(self):
+        # A pool inherited across fork has no threads behind it
+        if self._executor is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="collector")
+        return self._executor
+
+    def _store(self, collector, future):
+        with self._lock:
+            if collector.future is future:
+                collector.future = None
+            try:
+                collector.value = future.result()
+            except Exception:
+                return
+            collector.has_value = True
+            collector.fetched_at = time.monotonic()
+
+    def _probe(self, collector):
+        # Runs on the pool: the probe's own duration, whoever ends up waiting for it
+        started = time.perf_counter()
+        try:
+            return collector.func()
+        finally:
+            perf.observe(f"probe.{collector.name}", (time.perf_counter() - started) * 1000, request_timing=False)
+
+    def _submit(self, collector):
+        """Start the probe unless one is already in flight; return its future."""
+        with self._lock:
+            future = collector.future
+            if future is None:
+                future = self._get_executor().submit(self._probe, collector)
+                collector.future = future
+                future.add_done_callback(lambda f, c=collector: self._store(c, f))
+            return future
+
+    def collect(self, names=None):
+        """Run the named collectors (all by default); returns (values, stale_names)."""
+        started = time.monotonic()
+        selected = [self._collectors[name] for name in (names or self._collectors)]
+
+        pending = {}
+        values = {}
+        for collector in selected:
+            if collector.fresh():
+                values[collector.name] = collector.value
+            else:
+                pending[collector.name] = (collector, self._submit(collector))
+
+        stale = []
+        for name, (collector, future) in pending.items():
+            remaining = collector.timeout - (time.monotonic() - started)
+            try:
+                values[name] = future.result(timeout=max(0.0, remaining))
+            except (FutureTimeout, Exception):
+                values[name] = collector.value if collector.has_value else collector.default
+                stale.append(name)
+            # Time this request spent waiting, counted from the start of collect()
+            perf.observe(f"collect.{name}", (time.monotonic() - started) * 1000,
+                         desc="stale" if name in stale else None)
+
+        return values, stale
@@ -0,0 +1,126 @@
+import os
+import gzip
+import threading
+
+from flask import request
+
+# Compress dynamic HTML/JSON responses for clients that accept it
+COMPRESS_RESPONSES = os.environ.get("COMPRESS_RESPONSES", "1") == "1"
+
+# Bodies smaller than this aren't worth the CPU or the extra headers
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+
+# Per-request levels: fast enough for every page view on a Pi; static assets
+# are precompressed at the maximum level instead (see basecamp_assets)
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESS_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+_brotli_module = None
+_brotli_checked = False
+
+
+def load_brotli():
+    """The brotli module if it's installed, else None (gzip is always available)."""
+    global _brotli_module, _brotli_checked
+    if not _brotli_checked:
+        try:
+            import brotli
+        except ImportError:
+            brotli = None
+        _brotli_module, _brotli_checked = brotli, True
+    return _brotli_module
+
+
+def negotiate_encoding(accept_encodings, available=("br", "gzip")):
+    """Best of `available` the client accepts ("br" before "gzip"), or None."""
+    for encoding in available:
+        if encoding == "br" and load_brotli() is None:
+            continue
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+class CompressionStats:
+    """Bytes in and out per encoding, for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, encoding, raw, compressed):
+        with self._lock:
+            stats = self._stats.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0})
+            stats["responses"] += 1
+            stats["bytes_in"] += raw
+            stats["bytes_out"] += compressed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                encoding: {**stats, "ratio": round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else None}
+                for encoding, stats in self._stats.items()
+            }
+
+
+compression_stats = CompressionStats()
+
+
+def compress_response(response):
+    """
+    after_request hook: gzip or brotli the body of buffered HTML/JSON/text
+    responses when the client accepts it. Streams (SSE), file responses
+    (direct_passthrough, e.g. static assets) and anything already encoded
+    are left alone.
+    """
+    if not COMPRESS_RESPONSES:
+        return response
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+
+    # Caches must keep one copy per encoding, whether or not this one is compressed
+    response.vary.add("Accept-Encoding")
+
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or "Content-Range" in response.headers
+    ):
+        return response
+
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    if encoding == "br":
+        compressed = load_brotli().compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # Different bytes, different tag
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    compression_stats.record(encoding, len(data), len(compressed))
+    return response
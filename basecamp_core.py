@@ -1,18 +1,21 @@
 import os
-import json
-from datetime import datetime
+import atexit
 from functools import wraps
 
 from flask import request, redirect, session, url_for
 
+from basecamp_logs import LOG_FILE, LOG_ASYNC, audit_writer, log_timestamp
+from basecamp_logindex import log_index
+from basecamp_logdb import AUDIT_BACKEND, audit_db
+from basecamp_analytics import audit_rollups
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-LOG_FILE = os.path.join(BASE_DIR, "logs.jsonl")
 
 
 def log_action(username, action, details=None):
-    """Append a single log entry to logs.jsonl."""
+    """Queue a single log entry for logs.jsonl (written by the background writer)."""
     entry = {
-        "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        "timestamp": log_timestamp(),
         "username": username or "anonymous",
         "action": action,
         "ip": request.remote_addr,
@@ -21,12 +24,24 @@ def log_action(username, action, details=None):
         "user_agent": request.headers.get("User-Agent", ""),
     }
 
-    try:
-        with open(LOG_FILE, "a") as f:
-            f.write(json.dumps(entry) + "\n")
-    except OSError:
-        # Don't break the app if logging fails
-        pass
+    if LOG_ASYNC:
+        audit_writer.submit(entry)
+    else:
+        audit_writer.write_batch([entry])
+
+
+if AUDIT_BACKEND == "sqlite":
+    audit_writer.store = audit_db
+else:
+    # Keep the sidecar index in step with every batch written
+    audit_writer.add_listener(lambda entries: log_index.sync())
+
+# Analytics rollups are counted as entries are written
+audit_writer.add_listener(audit_rollups.record)
+
+# Don't lose queued entries (or their rollups) on a clean shutdown
+atexit.register(audit_rollups.checkpoint)
+atexit.register(audit_writer.flush)
 
 
 def login_required(view_func):
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app, render_template
+from markupsafe import Markup
+
+# Rendered fragments kept per process; keys come from request data (e.g. the
+# Host header), so the cache is bounded
+FRAGMENT_CACHE_SIZE = 64
+
+
+class FragmentCache:
+    """
+    Rendered template partials that don't change between requests.
+
+    fragment(name, key=..., **context) renders `name` the first time and
+    returns the cached markup after that. `key` must cover everything in
+    `context` that changes the output. An entry is re-rendered when Jinja
+    reloads the template (TEMPLATES_AUTO_RELOAD / debug), so editing a
+    partial still shows up without a restart.
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, name, key=(), **context):
+        template = current_app.jinja_env.get_template(name)
+        cache_key = (name, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] is template:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Rendered outside the lock; two threads may both render a cold entry
+        html = Markup(render_template(template, **context))
+        with self._lock:
+            self._entries[cache_key] = (template, html)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+fragment_cache = FragmentCache()
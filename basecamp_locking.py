@@ -0,0 +1,206 @@
+import os
+import copy
+import json
+import fcntl
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds to wait for a lock before giving up with TimeoutError
+FILE_LOCK_TIMEOUT = float(os.environ.get("FILE_LOCK_TIMEOUT", "10"))
+
+# Locks live next to the file they guard, so replacing the file by rename
+# doesn't lose the lock
+LOCK_SUFFIX = ".lock"
+
+# Waits longer than this count as contended in the metrics
+LOCK_CONTENDED_SECONDS = 0.001
+
+
+class LockStats:
+    """Per-file counters of lock acquisitions and time spent waiting."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, path, exclusive, waited, timed_out=False):
+        with self._lock:
+            stats = self._stats.setdefault(path, {
+                "shared": 0,
+                "exclusive": 0,
+                "contended": 0,
+                "timeouts": 0,
+                "wait_total": 0.0,
+                "wait_max": 0.0,
+            })
+            if timed_out:
+                stats["timeouts"] += 1
+            else:
+                stats["exclusive" if exclusive else "shared"] += 1
+            if waited > LOCK_CONTENDED_SECONDS:
+                stats["contended"] += 1
+            stats["wait_total"] += waited
+            stats["wait_max"] = max(stats["wait_max"], waited)
+
+    def snapshot(self):
+        """{path: counters} with wait times in milliseconds, for this process."""
+        with self._lock:
+            result = {}
+            for path, stats in self._stats.items():
+                acquired = stats["shared"] + stats["exclusive"]
+                result[path] = {
+                    "shared": stats["shared"],
+                    "exclusive": stats["exclusive"],
+                    "contended": stats["contended"],
+                    "timeouts": stats["timeouts"],
+                    "wait_total_ms": round(stats["wait_total"] * 1000, 2),
+                    "wait_avg_ms": round(stats["wait_total"] * 1000 / acquired, 3) if acquired else 0.0,
+                    "wait_max_ms": round(stats["wait_max"] * 1000, 2),
+                }
+            return result
+
+
+lock_stats = LockStats()
+
+
+@contextmanager
+def file_lock(path, exclusive=True, timeout=FILE_LOCK_TIMEOUT):
+    """
+    Hold an advisory fcntl lock on `path` + ".lock" for the with-block:
+    shared for readers, exclusive for writers. Works across threads and
+    worker processes. Raises TimeoutError (an OSError) after `timeout`.
+    """
+    fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+    mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    started = time.monotonic()
+    delay = 0.001
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() - started >= timeout:
+                    lock_stats.record(path, exclusive, time.monotonic() - started, timed_out=True)
+                    raise TimeoutError(f"timed out waiting for lock on {path}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        lock_stats.record(path, exclusive, time.monotonic() - started)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def atomic_write(path, data, mode=0o644, durable=True):
+    """
+    Replace `path` with `data` (str or bytes) via a fsynced temp file and
+    rename, then fsync the directory so the rename survives a power cut.
+    An existing file keeps its permissions; a new one gets `mode`.
+    durable=False skips both fsyncs, for frequently rewritten state that
+    is rebuilt after a restart anyway; readers still never see it half-written.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+            f.flush()
+            if durable:
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        except FileNotFoundError:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if not durable:
+        return
+    # Make the rename itself durable
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class LeaderLock:
+    """
+    Exclusive lock on `path` that one process holds for as long as it
+    lives, so only one of several workers does a job (walks the NAS, reads
+    the sensors) while the rest use what it writes. When the holder exits,
+    the next worker to ask takes over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._pid = None
+
+    def held(self):
+        """True if this process holds (or just took) the lock."""
+        if self._file is None or self._pid != os.getpid():
+            try:
+                self._file = open(self.path, "a")
+            except OSError:
+                # Can't coordinate, so act alone
+                return True
+            self._pid = os.getpid()
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+
+
+def read_json_locked(path, fallback):
+    """Parse a JSON file under a shared lock; `fallback` if missing or invalid."""
+    try:
+        with file_lock(path, exclusive=False):
+            with open(path, "r") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        return fallback
+
+
+def write_json_locked(path, data, indent=2):
+    """Atomically replace a JSON file under an exclusive lock."""
+    with file_lock(path):
+        atomic_write(path, json.dumps(data, indent=indent))
+
+
+def read_lines_locked(path):
+    """All lines of a text file under a shared lock ([] if it doesn't exist)."""
+    try:
+        with file_lock(path, exclusive=False):
+            with open(path, "r") as f:
+                return f.readlines()
+    except FileNotFoundError:
+        return []
+
+
+def update_json_locked(path, change, fallback, indent=2):
+    """
+    Read-modify-write a JSON file under one exclusive lock, so concurrent
+    edits from other workers aren't lost. `change(data)` gets the parsed
+    file (a copy of `fallback` if missing or invalid) and returns the data
+    to write, or None to leave the file alone. Returns what change returned.
+    """
+    with file_lock(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = copy.deepcopy(fallback)
+        result = change(data)
+        if result is not None:
+            atomic_write(path, json.dumps(result, indent=indent))
+        return result
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import threading
+import time
+
+from basecamp_logs import (
+    BASE_DIR,
+    LOG_FILE,
+    open_log_sources,
+    parse_cursor,
+    parse_log_timestamp,
+)
+
+# Where audit events are stored: "jsonl" (logs.jsonl + segments) or "sqlite"
+AUDIT_BACKEND = os.environ.get("AUDIT_BACKEND", "jsonl")
+
+AUDIT_DB_FILE = os.environ.get("AUDIT_DB_FILE", os.path.join(BASE_DIR, "audit.db"))
+
+# Seconds a writer waits for another worker's transaction before giving up
+AUDIT_DB_BUSY_TIMEOUT = float(os.environ.get("AUDIT_DB_BUSY_TIMEOUT", "5"))
+
+# Rows per transaction when migrating
+AUDIT_DB_MIGRATE_BATCH = 1000
+
+# Cursor source name, so /api/logs cursors keep the "<source>:<position>" form
+AUDIT_DB_CURSOR_SOURCE = "db"
+
+# Columns count_by() may group on
+AUDIT_DB_GROUP_FIELDS = ("username", "action", "day")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL,
+    timestamp TEXT,
+    username TEXT,
+    action TEXT,
+    ip TEXT,
+    path TEXT,
+    details TEXT,
+    user_agent TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_username_ts ON events (username, ts);
+CREATE INDEX IF NOT EXISTS events_action_ts ON events (action, ts);
+CREATE TABLE IF NOT EXISTS migrations (
+    fingerprint TEXT PRIMARY KEY,
+    source TEXT,
+    "offset" INTEGER,
+    entries INTEGER,
+    migrated_at REAL
+);
+"""
+
+ENTRY_FIELDS = ("timestamp", "username", "action", "ip", "path", "details", "user_agent")
+
+
+def _row_values(entry):
+    return (
+        parse_log_timestamp(entry.get("timestamp")),
+        entry.get("timestamp"),
+        entry.get("username"),
+        entry.get("action"),
+        entry.get("ip"),
+        entry.get("path"),
+        json.dumps(entry.get("details") or {}),
+        entry.get("user_agent"),
+    )
+
+
+def _parse_entries(data, start=0):
+    """(entries, end): the JSON entries on the complete lines of data[start:], and where they stop."""
+    end = data.rfind(b"\n", start) + 1
+    if end <= start:
+        return [], start
+    entries = []
+    for line in data[start:end].split(b"\n"):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if isinstance(entry, dict):
+            entries.append(entry)
+    return entries, end
+
+
+def _entry_from_row(row):
+    entry = {field: row[field] for field in ENTRY_FIELDS}
+    try:
+        entry["details"] = json.loads(row["details"]) if row["details"] else {}
+    except json.JSONDecodeError:
+        entry["details"] = {}
+    return entry
+
+
+class AuditDB:
+    """
+    SQLite store for audit events.
+
+    WAL mode lets readers run alongside a writer, and busy_timeout makes
+    concurrent writers from other worker processes wait rather than fail.
+    Each thread gets its own connection, and a forked child opens fresh ones.
+    """
+
+    def __init__(self, path=AUDIT_DB_FILE, busy_timeout=AUDIT_DB_BUSY_TIMEOUT):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    # ───────── Connections ─────────
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    # ───────── Writes ─────────
+    def write_batch(self, entries):
+        """Insert entries in a single transaction."""
+        if not entries:
+            return
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO events (ts, timestamp, username, action, ip, path, details, user_agent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [_row_values(entry) for entry in entries],
+            )
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ───────── Queries ─────────
+    @staticmethod
+    def _where(user=None, action=None, since=None, until=None):
+        clauses, params = [], []
+        if user is not None:
+            clauses.append("username = ?")
+            params.append(user)
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return clauses, params
+
+    def query(self, user=None, action=None, since=None, until=None, limit=200, before=None):
+        """
+        Return (entries, next_cursor), newest first, with the same filters
+        and cursor form as basecamp_logindex.query_log().
+        """
+        if limit <= 0:
+            return [], None
+        clauses, params = self._where(user, action, since, until)
+        if before:
+            name, before_id = parse_cursor(before)
+            if name != AUDIT_DB_CURSOR_SOURCE:
+                return [], None
+            clauses.append("id < ?")
+            params.append(before_id)
+
+        sql = "SELECT * FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self.connect().execute(sql, params + [limit]).fetchall()
+
+        entries = [_entry_from_row(row) for row in rows]
+        cursor = f"{AUDIT_DB_CURSOR_SOURCE}:{rows[-1]['id']}" if len(rows) == limit else None
+        return entries, cursor
+
+    def count_by(self, field, user=None, action=None, since=None, until=None, limit=50):
+        """[(value, count)] grouped on `field` (see AUDIT_DB_GROUP_FIELDS), largest first."""
+        if field not in AUDIT_DB_GROUP_FIELDS:
+            raise ValueError(f"cannot group by {field!r}")
+        column = "date(ts, 'unixepoch', 'localtime')" if field == "day" else field
+        clauses, params = self._where(user, action, since, until)
+        sql = f"SELECT {column} AS value, COUNT(*) AS n FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " GROUP BY value ORDER BY n DESC, value LIMIT ?"
+        return [(row["value"], row["n"]) for row in self.connect().execute(sql, params + [limit])]
+
+    def iter_entries(self, batch=AUDIT_DB_MIGRATE_BATCH):
+        """Every stored entry, oldest first."""
+        last_id = 0
+        while True:
+            rows = self.connect().execute(
+                "SELECT * FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _entry_from_row(row)
+            last_id = rows[-1]["id"]
+
+    def count(self):
+        return self.connect().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    # ───────── Migration ─────────
+    def _progress(self, conn, fingerprint):
+        """(offset, entries, source name) already imported from a source's contents."""
+        row = conn.execute('SELECT "offset", entries, source FROM migrations WHERE fingerprint = ?',
+                           (fingerprint,)).fetchone()
+        if row is None:
+            return 0, 0, None
+        return row["offset"], row["entries"], row["source"]
+
+    def migrate_jsonl(self, path=None, segment_dir=None, force=False):
+        """
+        Copy logs.jsonl and its segments into the database, oldest first.
+
+        Each source records how far it has been imported, keyed on its
+        fingerprint (the hash of its first line), so logs.jsonl keeps its
+        progress after rotating into a segment; running it again imports
+        only lines added since. A source's rows and its progress commit in
+        one transaction, so an interrupted run is retried cleanly.
+        Returns {source_name: entries_imported}.
+        """
+        conn = self.connect()
+        imported = {}
+
+        with open_log_sources(path, segment_dir) as sources:
+            # Sources are newest first; insert oldest first to keep id order
+            for source in reversed(sources):
+                try:
+                    data = source.data()
+                except (OSError, EOFError):
+                    continue
+                if b"\n" not in data:
+                    # First line still being written, so no stable fingerprint yet
+                    continue
+                name, fingerprint = source.name, source.id
+                start, done, recorded_name = (0, 0, None) if force else self._progress(conn, fingerprint)
+                entries, end = _parse_entries(data, start)
+                if end == start and recorded_name == name:
+                    continue
+
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for batch in range(0, len(entries), AUDIT_DB_MIGRATE_BATCH):
+                        conn.executemany(
+                            "INSERT INTO events (ts, timestamp, username, action, ip, path, details, user_agent) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            [_row_values(entry) for entry in entries[batch:batch + AUDIT_DB_MIGRATE_BATCH]],
+                        )
+                    # Recorded under its current name, which changes when the log rotates
+                    conn.execute(
+                        'INSERT OR REPLACE INTO migrations (fingerprint, source, "offset", entries, migrated_at) '
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (fingerprint, name, end, done + len(entries), time.time()),
+                    )
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+                if entries:
+                    imported[name] = len(entries)
+        return imported
+
+audit_db = AuditDB()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the SQLite audit-log backend.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="import logs.jsonl (and segments) into the database")
+    migrate.add_argument("--log-file", default=LOG_FILE)
+    migrate.add_argument("--force", action="store_true", help="re-import sources already migrated")
+    sub.add_parser("stats", help="show event counts")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        imported = audit_db.migrate_jsonl(args.log_file, force=args.force)
+        if not imported:
+            print("Nothing to migrate.")
+        for name, count in imported.items():
+            print(f"{name}: {count} entries")
+        print(f"{audit_db.count()} events in {audit_db.path}")
+    elif args.command == "stats":
+        print(f"{audit_db.count()} events in {audit_db.path}")
+        for action, count in audit_db.count_by("action", limit=20):
+            print(f"  {action}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,530 @@
+import os
+import json
+import fcntl
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from basecamp_locking import atomic_write
+from basecamp_logs import (
+    LOG_FILE,
+    SEGMENT_INDEX_SUFFIX,
+    add_segment_listener,
+    find_source,
+    open_log_sources,
+    parse_cursor,
+    parse_log_timestamp,
+)
+
+# Sidecar index for the active log, one JSON row per entry:
+#   [offset, length, ts_epoch, username, action]
+LOG_INDEX_FILE = os.environ.get("BASECAMP_LOG_INDEX_FILE", LOG_FILE + ".idx")
+
+LOG_INDEX_VERSION = 1
+
+# Segments never change, so each gets a binary index (<segment>.idx) written
+# once when it is compressed: a JSON header line, then the packed arrays
+SEGMENT_INDEX_VERSION = 1
+
+# Indexes of rotated-out sources (segments, .rotating) are kept in memory
+# once loaded; beyond this many entries across all of them, the least
+# recently used are dropped (about 45 bytes per entry)
+LOG_INDEX_CACHE_ROWS = int(os.environ.get("LOG_INDEX_CACHE_ROWS", "500000"))
+
+
+def _row_for(offset, line):
+    """Index row for one raw log line, or None if it isn't a JSON entry."""
+    try:
+        entry = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(entry, dict):
+        return None
+    return (offset, len(line), parse_log_timestamp(entry.get("timestamp")),
+            entry.get("username"), entry.get("action"))
+
+
+def _index_bytes(data, base=0, complete_only=True):
+    """Rows for every line in `data` (which starts at byte `base`) and the bytes consumed."""
+    rows = []
+    pos = 0
+    while pos < len(data):
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            if complete_only:
+                # Half-written line; pick it up on the next sync
+                break
+            newline = len(data)
+        line = data[pos:newline]
+        if line.strip():
+            row = _row_for(base + pos, line)
+            if row is not None:
+                rows.append(row)
+        pos = newline + 1
+    return rows, min(pos, len(data))
+
+
+def _day(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d") if ts is not None else None
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class IndexedSource:
+    """
+    Index of one log file: packed columns with one slot per entry in offset
+    order, and postings mapping each user, action and day to the ascending
+    row numbers that carry it. Everything is only ever appended to (offsets
+    last), so a reader that noted len() keeps a consistent view.
+    """
+
+    COLUMNS = ("offsets", "lengths", "keys", "users", "actions", "days", "untimed")
+    POSTINGS = ("by_user", "by_action", "by_day")
+
+    def __init__(self):
+        self.offsets = array("q")
+        self.lengths = array("i")
+        # Entry time; unreadable ones carry their predecessor's, for bisecting
+        self.keys = array("d")
+        # Value ids (positions in self.values) per row
+        self.users = array("i")
+        self.actions = array("i")
+        self.days = array("i")
+        self.values = []
+        self._ids = {}
+        self.by_user = {}
+        self.by_action = {}
+        self.by_day = {}
+        # Rows without a readable time, which no time bound matches
+        self.untimed = array("i")
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Index of a whole file's contents."""
+        source = cls()
+        source.extend(_index_bytes(data, complete_only=False)[0])
+        return source
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def time(self, row):
+        """Time of `row`, or None if it had none readable."""
+        i = bisect_left(self.untimed, row)
+        if i < len(self.untimed) and self.untimed[i] == row:
+            return None
+        return self.keys[row]
+
+    def value_id(self, value):
+        """Id of `value` in this source, or None if no entry has it."""
+        return self._ids.get(_hashable(value))
+
+    def _intern(self, value):
+        value = _hashable(value)
+        vid = self._ids.get(value)
+        if vid is None:
+            vid = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return value, vid
+
+    def extend(self, rows):
+        last = self.keys[-1] if len(self.keys) else 0
+        for offset, length, ts, user, action in rows:
+            row = len(self.offsets)
+            if ts is None:
+                self.untimed.append(row)
+            else:
+                last = ts
+            for column, postings, value in ((self.users, self.by_user, user),
+                                            (self.actions, self.by_action, action),
+                                            (self.days, self.by_day, _day(ts))):
+                value, vid = self._intern(value)
+                column.append(vid)
+                postings.setdefault(value, array("i")).append(row)
+            self.keys.append(last)
+            self.lengths.append(length)
+            self.offsets.append(offset)
+
+    def rows_matching(self, lo, hi, user=None, action=None):
+        """Ascending row numbers in [lo, hi) with the given user and action (None = any)."""
+        filters = []
+        for postings, column, value in ((self.by_user, self.users, user),
+                                        (self.by_action, self.actions, action)):
+            if value is None:
+                continue
+            rows = postings.get(_hashable(value))
+            if rows is None:
+                return ()
+            filters.append((rows, column, self.value_id(value)))
+        if not filters:
+            return range(lo, hi)
+
+        # Walk the shortest postings list, checking the other filter per row
+        filters.sort(key=lambda f: len(f[0]))
+        rows = filters[0][0]
+        rows = rows[bisect_left(rows, lo):bisect_left(rows, hi)]
+        if len(filters) == 1:
+            return rows
+        _, column, vid = filters[1]
+        return [row for row in rows if column[row] == vid]
+
+    # ───────── Serialising ─────────
+    def dumps(self, **meta):
+        """Header line (with `meta`) followed by every array's raw bytes."""
+        header = dict(meta, values=self.values, lengths=[len(getattr(self, name)) for name in self.COLUMNS],
+                      postings=[[[self._ids[value], len(rows)] for value, rows in getattr(self, name).items()]
+                                for name in self.POSTINGS])
+        parts = [json.dumps(header).encode() + b"\n"]
+        parts.extend(getattr(self, name).tobytes() for name in self.COLUMNS)
+        for name in self.POSTINGS:
+            parts.extend(rows.tobytes() for rows in getattr(self, name).values())
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data):
+        """(meta, IndexedSource) from dumps() output. Raises ValueError if it's malformed."""
+        newline = data.find(b"\n")
+        try:
+            meta = json.loads(data[:newline])
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError("unreadable index header")
+        source = cls()
+        view = memoryview(data)
+        pos = newline + 1
+
+        def take(typecode, count):
+            nonlocal pos
+            column = array(typecode)
+            end = pos + count * column.itemsize
+            if end > len(data):
+                raise ValueError("truncated index")
+            column.frombytes(view[pos:end])
+            pos = end
+            return column
+
+        try:
+            source.values = meta["values"]
+            source._ids = {value: vid for vid, value in enumerate(source.values)}
+            for name, count in zip(cls.COLUMNS, meta["lengths"], strict=True):
+                setattr(source, name, take(getattr(source, name).typecode, count))
+            for name, entries in zip(cls.POSTINGS, meta["postings"], strict=True):
+                setattr(source, name, {source.values[vid]: take("i", count) for vid, count in entries})
+        except (KeyError, TypeError, IndexError) as e:
+            raise ValueError(f"malformed index: {e}")
+        return meta, source
+
+
+# ───────────── Segment indexes ─────────────
+def write_segment_index(segment_path, source, size):
+    """Persist `source` as the index of the segment whose compressed size is `size`."""
+    atomic_write(segment_path + SEGMENT_INDEX_SUFFIX, source.dumps(version=SEGMENT_INDEX_VERSION, size=size))
+
+
+def load_segment_index(log_source):
+    """
+    IndexedSource for an opened segment: its sidecar if that matches,
+    otherwise built from the segment (and the sidecar written for next time).
+    """
+    try:
+        with open(log_source.path + SEGMENT_INDEX_SUFFIX, "rb") as f:
+            meta, source = IndexedSource.loads(f.read())
+        if meta.get("version") == SEGMENT_INDEX_VERSION and meta.get("size") == log_source.size:
+            return source
+    except (OSError, ValueError):
+        pass
+    # Written before sidecars existed, or the sidecar was lost
+    source = IndexedSource.from_bytes(log_source.data())
+    if os.path.exists(log_source.path):
+        try:
+            write_segment_index(log_source.path, source, log_source.size)
+        except OSError:
+            pass
+    return source
+
+
+def _on_new_segment(segment_path, data, size):
+    write_segment_index(segment_path, IndexedSource.from_bytes(data), size)
+
+
+add_segment_listener(_on_new_segment)
+
+
+class SourceCache:
+    """Indexes of rotated-out sources, least recently used dropped beyond `max_rows` entries in total."""
+
+    def __init__(self, max_rows=LOG_INDEX_CACHE_ROWS):
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._sources = OrderedDict()
+        self._rows = 0
+
+    def get(self, key, build):
+        """The index cached under `key`, or build() it and cache that."""
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+                return source
+        source = build()
+        with self._lock:
+            if key not in self._sources:
+                self._sources[key] = source
+                self._rows += len(source)
+                # Always keep the one just built
+                while self._rows > self.max_rows and len(self._sources) > 1:
+                    _, dropped = self._sources.popitem(last=False)
+                    self._rows -= len(dropped)
+        return source
+
+    def stats(self):
+        with self._lock:
+            return {"sources": len(self._sources), "rows": self._rows, "max_rows": self.max_rows}
+
+
+class LogIndex:
+    """
+    Incremental index of the active audit log.
+
+    sync() indexes whatever was appended since the last call and appends
+    those rows to a sidecar file, so a restart (or another worker) only
+    has to read the sidecar plus the unindexed tail. A new inode (the log
+    rotated) or a shorter file starts the index over.
+    """
+
+    def __init__(self, path=None, sidecar=None):
+        self.path = path or LOG_FILE
+        self.sidecar = sidecar or (LOG_INDEX_FILE if self.path == LOG_FILE else self.path + ".idx")
+        self._lock = threading.Lock()
+        self._source = IndexedSource()
+        self._static = SourceCache()
+        self._inode = None
+        self._end = 0
+        self._sidecar_pos = 0
+
+    # ───────── Sidecar ─────────
+    def _reset(self, side, inode):
+        side.seek(0)
+        side.truncate()
+        side.write((json.dumps({"version": LOG_INDEX_VERSION, "inode": inode}) + "\n").encode())
+        side.flush()
+        self._source = IndexedSource()
+        self._inode = inode
+        self._end = 0
+        self._sidecar_pos = side.tell()
+
+    def _read_sidecar_rows(self, side):
+        side.seek(self._sidecar_pos)
+        data = side.read()
+        rows = []
+        consumed = 0
+        for line in data.split(b"\n")[:-1]:
+            consumed += len(line) + 1
+            try:
+                rows.append(tuple(json.loads(line)))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+        self._sidecar_pos += consumed
+        self._source.extend(rows)
+        if rows:
+            self._end = max(self._end, rows[-1][0] + rows[-1][1] + 1)
+
+    def _load_sidecar(self, side, inode):
+        side.seek(0)
+        header = side.readline()
+        try:
+            meta = json.loads(header)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            meta = {}
+        if meta.get("version") != LOG_INDEX_VERSION or meta.get("inode") != inode:
+            self._reset(side, inode)
+            return
+        self._source = IndexedSource()
+        self._inode = inode
+        self._end = 0
+        self._sidecar_pos = len(header)
+        self._read_sidecar_rows(side)
+
+    # ───────── Public API ─────────
+    def sync(self):
+        """Bring the index up to date with the active log; returns its IndexedSource."""
+        return self._sync()[0]
+
+    def _sync(self):
+        # (IndexedSource, inode of the file it indexes)
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self._source = IndexedSource()
+                self._inode = None
+                return self._source, None
+
+            try:
+                side = open(self.sidecar, "a+b")
+            except OSError:
+                return self._source, self._inode
+            with side:
+                fcntl.flock(side, fcntl.LOCK_EX)
+                try:
+                    if self._inode != st.st_ino:
+                        self._load_sidecar(side, st.st_ino)
+                    else:
+                        # Rows another process appended since we last looked
+                        self._read_sidecar_rows(side)
+
+                    if st.st_size < self._end:
+                        self._reset(side, st.st_ino)
+
+                    if st.st_size > self._end:
+                        with open(self.path, "rb") as f:
+                            f.seek(self._end)
+                            rows, consumed = _index_bytes(f.read(), base=self._end)
+                        if rows:
+                            side.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+                            side.flush()
+                            self._source.extend(rows)
+                        self._end += consumed
+                        self._sidecar_pos = side.tell()
+                finally:
+                    fcntl.flock(side, fcntl.LOCK_UN)
+            return self._source, self._inode
+
+    def source_for(self, log_source):
+        """IndexedSource for an opened part of the log (a LogSource from open_log_sources())."""
+        if log_source.path == self.path:
+            source, inode = self._sync()
+            if inode == log_source.inode:
+                return source
+            # Rotated since it was opened; index the file we hold instead
+        # Rotated-out files never change, so (inode, size, mtime) pins one
+        key = (log_source.inode, log_source.size, log_source.mtime_ns)
+        if log_source.segment:
+            return self._static.get(key, lambda: load_segment_index(log_source))
+        return self._static.get(key, lambda: IndexedSource.from_bytes(log_source.data()))
+
+
+def _in_bounds(ts, since, until):
+    if ts is None:
+        return False
+    if since is not None and ts < since:
+        return False
+    if until is not None and ts >= until:
+        return False
+    return True
+
+
+def query_log(user=None, action=None, since=None, until=None, limit=200, before=None,
+              index=None, segment_dir=None):
+    """
+    Return (entries, next_cursor) for entries matching every given filter,
+    newest first. `since`/`until` are epoch seconds (until is exclusive).
+
+    User and action filters are looked up in the postings; only matching
+    records are read from disk. Time bounds are found by binary search,
+    which relies on the log being appended in time order. Cursors are the
+    same "<source id>:<offset>" form read_log_entries() uses.
+    """
+    index = index or log_index
+    entries = []
+    if limit <= 0:
+        return entries, None
+
+    timed = since is not None or until is not None
+    with open_log_sources(index.path, segment_dir) as sources:
+        start_index, start_offset = 0, None
+        if before:
+            source_id, start_offset = parse_cursor(before)
+            start_index = find_source(sources, source_id)
+            if start_index is None:
+                return entries, None
+
+        for position in range(start_index, len(sources)):
+            log_source = sources[position]
+            try:
+                source = index.source_for(log_source)
+            except (OSError, EOFError):
+                continue
+
+            count = len(source)
+            keys = source.keys
+            if since is not None and count and keys[count - 1] < since:
+                # Everything from here on is older still
+                break
+            lo = bisect_left(keys, since, 0, count) if since is not None else 0
+            hi = bisect_left(keys, until, 0, count) if until is not None else count
+            if position == start_index and start_offset is not None:
+                hi = min(hi, bisect_left(source.offsets, start_offset, 0, count))
+
+            for row in reversed(source.rows_matching(lo, hi, user, action)):
+                if timed and not _in_bounds(source.time(row), since, until):
+                    continue
+                offset = source.offsets[row]
+                try:
+                    entries.append(json.loads(log_source.read(offset, source.lengths[row])))
+                except (OSError, EOFError, json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if len(entries) >= limit:
+                    return entries, f"{log_source.id}:{offset}"
+
+    return entries, None
+
+
+def _sources_in_range(index, sources, since, until):
+    """Yield (source, lo, hi): the rows of each opened source that fall in [since, until)."""
+    for log_source in sources:
+        try:
+            source = index.source_for(log_source)
+        except (OSError, EOFError):
+            continue
+        count = len(source)
+        if since is not None and count and source.keys[count - 1] < since:
+            break
+        lo = bisect_left(source.keys, since, 0, count) if since is not None else 0
+        hi = bisect_left(source.keys, until, 0, count) if until is not None else count
+        yield source, lo, hi
+
+
+def count_by(field, user=None, action=None, since=None, until=None, limit=50, index=None, segment_dir=None):
+    """
+    [(value, count)] grouped on "username", "action" or "day", largest first.
+    Counts come straight from the index; no log records are read. Without
+    a user or action filter each group is two bisects into its postings.
+    """
+    columns = {"username": ("users", "by_user"), "action": ("actions", "by_action"), "day": ("days", "by_day")}
+    if field not in columns:
+        raise ValueError(f"cannot group by {field!r}")
+    column_name, postings_name = columns[field]
+    index = index or log_index
+    timed = since is not None or until is not None
+    counts = Counter()
+    with open_log_sources(index.path, segment_dir) as sources:
+        for source, lo, hi in _sources_in_range(index, sources, since, until):
+            column, values = getattr(source, column_name), source.values
+            if user is None and action is None:
+                for value, rows in list(getattr(source, postings_name).items()):
+                    n = bisect_left(rows, hi) - bisect_left(rows, lo)
+                    if n:
+                        counts[value] += n
+                if timed:
+                    # Untimed rows sit among the timed ones but never match a bound
+                    untimed = source.untimed
+                    for i in range(bisect_left(untimed, lo), bisect_left(untimed, hi)):
+                        counts[values[column[untimed[i]]]] -= 1
+                continue
+            for row in source.rows_matching(lo, hi, user, action):
+                if timed and not _in_bounds(source.time(row), since, until):
+                    continue
+                counts[values[column[row]]] += 1
+    ranked = [(value, count) for value, count in counts.items() if count > 0]
+    return sorted(ranked, key=lambda item: (-item[1], str(item[0])))[:limit]
+
+
+log_index = LogIndex()
@@ -0,0 +1,662 @@
+import os
+import io
+import glob
+import gzip
+import json
+import queue
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
+from datetime import date, datetime, timedelta, timezone
+
+from basecamp_locking import file_lock
+from basecamp_threads import ProcessThread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Active audit log; older entries live in gzip segments next to it
+LOG_FILE = os.environ.get("BASECAMP_LOG_FILE", os.path.join(BASE_DIR, "logs.jsonl"))
+LOG_SEGMENT_DIR = os.environ.get("BASECAMP_LOG_SEGMENT_DIR", os.path.join(BASE_DIR, "log_segments"))
+
+# Rotate once the active file reaches this size (0 disables size rotation)
+LOG_ROTATE_BYTES = int(os.environ.get("LOG_ROTATE_BYTES", str(5 * 1024 * 1024)))
+
+# Also rotate at the first write of a new day
+LOG_ROTATE_DAILY = os.environ.get("LOG_ROTATE_DAILY", "0") == "1"
+
+# Retention: keep at most this many segments, and none older than this many days (0 = no limit)
+LOG_RETENTION_SEGMENTS = int(os.environ.get("LOG_RETENTION_SEGMENTS", "50"))
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "0"))
+
+# Background writer: hand entries to a thread instead of writing in the request
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "1") == "1"
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Longest an entry waits in the queue before its batch is written
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "0.5"))
+
+# fsync policy: "never" (leave it to the OS), "batch" (after every write)
+# or "interval" (at most once every LOG_FSYNC_INTERVAL seconds)
+LOG_FSYNC = os.environ.get("LOG_FSYNC", "interval")
+LOG_FSYNC_INTERVAL = float(os.environ.get("LOG_FSYNC_INTERVAL", "30"))
+
+# Bytes read per seek when walking a log file backwards
+LOG_READ_BLOCK_SIZE = 64 * 1024
+
+# Entries are stamped in UTC; older lines may still be local "%d/%m/%Y %H:%M"
+LOG_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+LEGACY_TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M"
+
+SEGMENT_PREFIX = "logs-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+ROTATING_SUFFIX = ".rotating"
+
+# A segment's index lives beside it as <segment>.idx and is removed with it
+SEGMENT_INDEX_SUFFIX = ".idx"
+
+# Lock (on <log>.sources.lock) that readers share while listing and opening
+# the log's parts, and rotation and compression take while renaming them
+SOURCES_LOCK_SUFFIX = ".sources"
+
+# Decompressed segments kept in memory
+SEGMENT_CACHE_SIZE = 2
+
+
+# ───────────── Timestamps ─────────────
+def log_timestamp(now=None):
+    """Timestamp string for a new entry (ISO 8601, UTC)."""
+    return (now or datetime.now(timezone.utc)).strftime(LOG_TIMESTAMP_FORMAT)
+
+
+def parse_log_timestamp(value):
+    """
+    Epoch seconds for a log timestamp in either format, or None.
+    ISO values without an offset are taken as UTC; legacy values as local time.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value, LEGACY_TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def parse_time_bound(value, end=False):
+    """
+    Parse a since/until query value (ISO date/datetime or epoch seconds).
+    A bare date used as an upper bound covers that whole day.
+    Raises ValueError if it can't be parsed.
+    """
+    value = (value or "").strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    ts = parse_log_timestamp(value)
+    if ts is None:
+        raise ValueError(f"invalid time: {value!r}")
+    if end and len(value) == 10:
+        ts += timedelta(days=1).total_seconds()
+    return ts
+
+
+def format_log_timestamp(value):
+    """Display form of a log timestamp (local "%d/%m/%Y %H:%M"), whatever it was stored as."""
+    ts = parse_log_timestamp(value)
+    if ts is None:
+        return value or ""
+    return datetime.fromtimestamp(ts).strftime(LEGACY_TIMESTAMP_FORMAT)
+
+
+# ───────────── Reverse reading ─────────────
+def _iter_fileobj_reverse(f, before=None, block_size=LOG_READ_BLOCK_SIZE):
+    size = f.seek(0, os.SEEK_END)
+    pos = size if before is None else max(0, min(before, size))
+    carry = b""
+
+    while pos > 0:
+        read = min(block_size, pos)
+        pos -= read
+        f.seek(pos)
+        parts = (f.read(read) + carry).split(b"\n")
+
+        # parts[0] may be the tail of a line that started in an earlier
+        # block; hold it back until we reach that block (or the file start)
+        starts = []
+        offset = pos
+        for part in parts:
+            starts.append(offset)
+            offset += len(part) + 1
+
+        for i in range(len(parts) - 1, 0, -1):
+            if parts[i].strip():
+                yield starts[i], parts[i]
+        carry = parts[0]
+
+    if carry.strip():
+        yield 0, carry
+
+
+def iter_lines_reverse(path, before=None, block_size=LOG_READ_BLOCK_SIZE):
+    """
+    Yield (offset, line_bytes) for the lines of `path`, newest first.
+
+    Only lines starting before byte offset `before` are returned (the whole
+    file when None). The file is read backwards in blocks, so the cost
+    depends on how many lines are consumed, not on the file size.
+    """
+    with open(path, "rb") as f:
+        yield from _iter_fileobj_reverse(f, before, block_size)
+
+
+_segment_cache = OrderedDict()
+_segment_cache_lock = threading.Lock()
+
+
+def _segment_bytes(path, mtime_ns, f=None):
+    # Keyed on mtime so a rewritten segment is never served stale
+    key = (path, mtime_ns)
+    with _segment_cache_lock:
+        data = _segment_cache.get(key)
+        if data is not None:
+            _segment_cache.move_to_end(key)
+            return data
+    if f is None:
+        with gzip.open(path, "rb") as gz:
+            data = gz.read()
+    else:
+        f.seek(0)
+        data = gzip.GzipFile(fileobj=f, mode="rb").read()
+    with _segment_cache_lock:
+        _segment_cache[key] = data
+        while len(_segment_cache) > SEGMENT_CACHE_SIZE:
+            _segment_cache.popitem(last=False)
+    return data
+
+
+def read_segment(path):
+    """Decompressed contents of a gzip segment (the last two are cached)."""
+    return _segment_bytes(path, os.stat(path).st_mtime_ns)
+
+
+# ───────────── Segments ─────────────
+def source_fingerprint(first_line):
+    """
+    Stable id of a log part: a hash of its first line. It stays the same
+    while logs.jsonl becomes logs.jsonl.rotating and then a segment.
+    """
+    return hashlib.sha1(first_line).hexdigest()[:16]
+
+
+def segment_fingerprint(name):
+    """The fingerprint a segment's name carries, or None for older names."""
+    stem = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]
+    stamp, sep, fingerprint = stem.rpartition("-")
+    return fingerprint if sep and len(fingerprint) == 16 and stamp.count("-") == 2 else None
+
+
+_segment_listeners = []
+
+
+def add_segment_listener(func):
+    """
+    Call `func(segment_path, data, size)` for every new segment, with its
+    decompressed contents and compressed size, just before it appears
+    under its name (e.g. to write the segment's index).
+    """
+    _segment_listeners.append(func)
+
+
+def list_segments(segment_dir=None):
+    """Paths of the compressed segments, newest first."""
+    segment_dir = segment_dir or LOG_SEGMENT_DIR
+    pattern = os.path.join(segment_dir, f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}")
+    return sorted(glob.glob(pattern), reverse=True)
+
+
+def log_sources(path=None, segment_dir=None):
+    """Every readable part of the audit log, newest first: [(name, full_path)]."""
+    path = path or LOG_FILE
+    sources = [(os.path.basename(path), path)]
+    rotating = path + ROTATING_SUFFIX
+    if os.path.exists(rotating):
+        # Rotated but not compressed yet
+        sources.append((os.path.basename(rotating), rotating))
+    sources.extend((os.path.basename(p), p) for p in list_segments(segment_dir))
+    return sources
+
+
+class LogSource:
+    """
+    One opened part of the audit log: the active file, a rotated file
+    waiting to be compressed, or a gzip segment. Reads go through the
+    handle, so they keep working after the file is renamed, compressed
+    or removed by retention.
+    """
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.segment = path.endswith(SEGMENT_SUFFIX)
+        self.f = open(path, "rb")
+        st = os.fstat(self.f.fileno())
+        self.inode, self.size, self.mtime_ns = st.st_ino, st.st_size, st.st_mtime_ns
+
+    @cached_property
+    def id(self):
+        """Fingerprint of the first line, which cursors use to find this part again."""
+        return (segment_fingerprint(self.name) if self.segment else None) or source_fingerprint(self._first_line())
+
+    def _first_line(self):
+        if self.segment:
+            data = self.data()
+            newline = data.find(b"\n")
+            return data if newline == -1 else data[:newline]
+        chunks = []
+        pos = 0
+        while True:
+            chunk = os.pread(self.f.fileno(), LOG_READ_BLOCK_SIZE, pos)
+            newline = chunk.find(b"\n")
+            if newline != -1 or not chunk:
+                chunks.append(chunk if newline == -1 else chunk[:newline])
+                return b"".join(chunks)
+            chunks.append(chunk)
+            pos += len(chunk)
+
+    def data(self):
+        """Whole (decompressed) contents."""
+        if self.segment:
+            return _segment_bytes(self.path, self.mtime_ns, self.f)
+        self.f.seek(0)
+        return self.f.read()
+
+    def read(self, offset, length):
+        if self.segment:
+            return self.data()[offset:offset + length]
+        return os.pread(self.f.fileno(), length, offset)
+
+    def iter_reverse(self, before=None):
+        """(offset, line_bytes) newest first, as iter_lines_reverse()."""
+        if self.segment:
+            return _iter_fileobj_reverse(io.BytesIO(self.data()), before)
+        return _iter_fileobj_reverse(self.f, before)
+
+    def close(self):
+        self.f.close()
+
+
+@contextmanager
+def open_log_sources(path=None, segment_dir=None):
+    """
+    Open every part of the audit log, newest first: [LogSource].
+
+    Listing and opening happen under the shared sources lock, which rotation
+    and compression hold exclusively while they rename, so the set is
+    consistent: no part is missing (a .rotating mid-compression) and none
+    appears twice (a new segment next to its not-yet-removed .rotating).
+    """
+    path = path or LOG_FILE
+    sources = []
+    try:
+        with file_lock(path + SOURCES_LOCK_SUFFIX, exclusive=False):
+            for name, full_path in log_sources(path, segment_dir):
+                try:
+                    sources.append(LogSource(name, full_path))
+                except FileNotFoundError:
+                    # No active file yet, or a segment retention just removed
+                    continue
+        yield sources
+    finally:
+        for source in sources:
+            source.close()
+
+
+def parse_cursor(cursor):
+    """Split a '<source>:<offset>' cursor. Raises ValueError if malformed."""
+    name, sep, offset = (cursor or "").rpartition(":")
+    if not sep or not name:
+        raise ValueError(f"invalid log cursor: {cursor!r}")
+    return name, int(offset)
+
+
+def find_source(sources, source_id):
+    """Position of the part with id `source_id` in `sources`, or None."""
+    # Ids are worked out on demand, so stop at the first match
+    for position, source in enumerate(sources):
+        if source.id == source_id:
+            return position
+    return None
+
+
+def iter_log_records(path=None, before=None, segment_dir=None):
+    """
+    Yield (source_id, offset, line_bytes) across the active file and every
+    segment, newest first, starting just before cursor `before` if given.
+    Cursors name a part by its fingerprint, so they survive rotation.
+    """
+    with open_log_sources(path, segment_dir) as sources:
+        start_index, start_offset = 0, None
+        if before:
+            source_id, start_offset = parse_cursor(before)
+            start_index = find_source(sources, source_id)
+            if start_index is None:
+                return
+
+        for index in range(start_index, len(sources)):
+            source = sources[index]
+            offset_limit = start_offset if index == start_index else None
+            try:
+                for offset, line in source.iter_reverse(offset_limit):
+                    yield source.id, offset, line
+            except (OSError, EOFError):
+                # Truncated segment; move on
+                continue
+
+
+def read_log_entries(path=None, limit=200, before=None, segment_dir=None):
+    """
+    Return (entries, next_cursor): up to `limit` parsed log entries older
+    than cursor `before`, newest first, spanning the active file and the
+    compressed segments. next_cursor is None once the oldest entry is reached.
+    """
+    entries = []
+    cursor = None
+    if limit <= 0:
+        return entries, None
+
+    records = iter_log_records(path, before, segment_dir)
+    try:
+        for source_id, offset, line in records:
+            try:
+                entries.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            if len(entries) >= limit:
+                cursor = f"{source_id}:{offset}"
+                break
+    finally:
+        # Closes the sources' handles now rather than at garbage collection
+        records.close()
+
+    return entries, cursor
+
+
+# ───────────── Rotation ─────────────
+def _needs_rotation(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size == 0:
+        return False
+    if LOG_ROTATE_BYTES and st.st_size >= LOG_ROTATE_BYTES:
+        return True
+    if LOG_ROTATE_DAILY and date.fromtimestamp(st.st_mtime) != date.today():
+        return True
+    return False
+
+
+def _segment_path(segment_dir, fingerprint):
+    # Names must sort chronologically, so wait out a same-microsecond clash
+    while True:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        if not glob.glob(os.path.join(segment_dir, f"{SEGMENT_PREFIX}{stamp}*")):
+            return os.path.join(segment_dir, f"{SEGMENT_PREFIX}{stamp}-{fingerprint}{SEGMENT_SUFFIX}")
+        time.sleep(0.001)
+
+
+def compress_rotated(path=None, segment_dir=None):
+    """
+    Gzip a rotated-out log into a new segment, then apply retention.
+    Holds a lock on the rotated file, so two workers (or a recovery and the
+    rotation's own thread) never turn the same file into two segments.
+    """
+    path = path or LOG_FILE
+    segment_dir = segment_dir or LOG_SEGMENT_DIR
+    rotating = path + ROTATING_SUFFIX
+    if not os.path.exists(rotating):
+        return None
+
+    try:
+        with file_lock(rotating):
+            # Someone else may have finished it while we waited
+            if not os.path.exists(rotating):
+                return None
+            os.makedirs(segment_dir, exist_ok=True)
+            with open(rotating, "rb") as src:
+                data = src.read()
+            newline = data.find(b"\n")
+            # The segment carries the fingerprint, so cursors into the
+            # rotated file still find their place
+            segment = _segment_path(segment_dir, source_fingerprint(data if newline == -1 else data[:newline]))
+            tmp_path = segment + ".tmp"
+            with gzip.open(tmp_path, "wb") as dst:
+                dst.write(data)
+            size = os.path.getsize(tmp_path)
+            for listener in _segment_listeners:
+                try:
+                    listener(segment, data, size)
+                except Exception:
+                    # Anything derived from a segment can be rebuilt later
+                    pass
+            # Readers never see both the segment and the .rotating, or neither
+            with file_lock(path + SOURCES_LOCK_SUFFIX):
+                os.replace(tmp_path, segment)
+                os.remove(rotating)
+    except OSError:
+        return None
+
+    apply_retention(segment_dir)
+    return segment
+
+
+def apply_retention(segment_dir=None):
+    """Delete segments beyond LOG_RETENTION_SEGMENTS or older than LOG_RETENTION_DAYS."""
+    segments = list_segments(segment_dir)
+    doomed = []
+    if LOG_RETENTION_SEGMENTS > 0:
+        doomed.extend(segments[LOG_RETENTION_SEGMENTS:])
+    if LOG_RETENTION_DAYS > 0:
+        cutoff = time.time() - LOG_RETENTION_DAYS * 86400
+        for segment in segments:
+            try:
+                if os.path.getmtime(segment) < cutoff:
+                    doomed.append(segment)
+            except OSError:
+                continue
+    for segment in set(doomed):
+        for doomed_path in (segment, segment + SEGMENT_INDEX_SUFFIX):
+            try:
+                os.remove(doomed_path)
+            except OSError:
+                pass
+
+
+def rotate_if_needed(path=None, segment_dir=None, background=True):
+    """
+    Rotate the active log when it is too big (or from an earlier day).
+    The rename is immediate; compression runs on a background thread.
+    Call with the log's lock held. Returns True if this call rotated the file.
+    """
+    path = path or LOG_FILE
+    if not _needs_rotation(path):
+        return False
+
+    rotating = path + ROTATING_SUFFIX
+    if os.path.exists(rotating):
+        # Left behind by a worker that died mid-compress (or still being
+        # compressed); finish it first, or link() below would fail forever
+        compress_rotated(path, segment_dir)
+    try:
+        # Readers must not list the file under both names
+        with file_lock(path + SOURCES_LOCK_SUFFIX):
+            # link() refuses to overwrite, so a rotation that is still being
+            # compressed (or a concurrent one) is never clobbered
+            os.link(path, rotating)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    except OSError:
+        return False
+
+    if background:
+        threading.Thread(target=compress_rotated, args=(path, segment_dir),
+                         name="log-compress", daemon=True).start()
+    else:
+        compress_rotated(path, segment_dir)
+    return True
+
+
+# ───────────── Buffered writer ─────────────
+class AuditLogWriter:
+    """
+    Batches audit entries on a background thread.
+
+    log_action() only puts the entry on a bounded queue. The writer thread
+    collects whatever arrives within LOG_FLUSH_INTERVAL of the first entry,
+    rotates if needed and appends the batch with one write. If the queue is
+    full the entry is dropped and counted rather than blocking the request.
+
+    With a `store` set (anything with write_batch(entries), e.g. the SQLite
+    backend) batches go there instead of to the file.
+    """
+
+    def __init__(self, path=None, segment_dir=None, queue_size=LOG_QUEUE_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, fsync=LOG_FSYNC, fsync_interval=LOG_FSYNC_INTERVAL,
+                 store=None):
+        self.path = path or LOG_FILE
+        self.store = store
+        self.segment_dir = segment_dir
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._queue = None
+        self._writer = ProcessThread(self._run, "audit-log-writer")
+        self._last_fsync = 0.0
+        self._counters = {"written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._last_write = None
+        self._listeners = []
+
+    def add_listener(self, func):
+        """Call `func(entries)` after every successful batch (e.g. to update an index)."""
+        self._listeners.append(func)
+
+    def _ensure_running(self):
+        self._writer.start(setup=self._new_queue)
+
+    def _new_queue(self):
+        # Entries queued in a parent process are the parent's to write
+        self._queue = queue.Queue(maxsize=self.queue_size)
+
+    def submit(self, entry):
+        """Queue one entry. Returns False (and counts a drop) if the queue is full."""
+        self._ensure_running()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            return False
+
+    def write_batch(self, entries):
+        """Write entries right now: to the store, or appended to the active log (rotating first if due)."""
+        if not entries:
+            return
+        try:
+            if self.store is not None:
+                self.store.write_batch(entries)
+            else:
+                self._append(entries)
+        except Exception:
+            # Don't break the app if logging fails
+            with self._lock:
+                self._counters["errors"] += 1
+                self._counters["dropped"] += len(entries)
+            return
+        with self._lock:
+            self._counters["written"] += len(entries)
+            self._counters["batches"] += 1
+            self._last_write = time.time()
+        for listener in self._listeners:
+            try:
+                listener(entries)
+            except Exception:
+                pass
+
+    def _append(self, entries):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        # Other workers append and rotate the same file
+        with file_lock(self.path):
+            rotate_if_needed(self.path, self.segment_dir)
+            with open(self.path, "a") as f:
+                f.write(data)
+                f.flush()
+                self._maybe_fsync(f)
+
+    def _maybe_fsync(self, f):
+        if self.fsync == "batch":
+            os.fsync(f.fileno())
+        elif self.fsync == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            os.fsync(f.fileno())
+            self._last_fsync = time.monotonic()
+
+    def _run(self):
+        if self.store is None:
+            # A rotation orphaned by a worker that exited mid-compress
+            compress_rotated(self.path, self.segment_dir)
+        q = self._queue
+        while True:
+            item = q.get()
+            batch = []
+            waiters = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    # flush() marker: write what we have now
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                try:
+                    item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+                except queue.Empty:
+                    break
+            self.write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is on disk (or `timeout` passes)."""
+        if not self._writer.running():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["last_write"] = self._last_write
+        counters["queued"] = self._queue.qsize() if self._queue is not None else 0
+        counters["queue_size"] = self.queue_size
+        return counters
+
+
+audit_writer = AuditLogWriter()
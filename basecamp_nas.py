@@ -0,0 +1,220 @@
+import os
+import json
+import threading
+import time
+
+from basecamp_core import BASE_DIR
+from basecamp_locking import LOCK_SUFFIX, LeaderLock, atomic_write
+from basecamp_perf import perf
+from basecamp_threads import ProcessThread
+
+NAS_PATH = os.environ.get("NAS_PATH", "/mnt/nasdata")
+
+# Snapshot of the last indexing pass, kept across restarts
+NAS_INDEX_FILE = os.environ.get("NAS_INDEX_FILE", os.path.join(BASE_DIR, "nas_index.json"))
+
+# Seconds between indexing passes
+NAS_INDEX_INTERVAL = float(os.environ.get("NAS_INDEX_INTERVAL", "900"))
+
+# With several worker processes only the one holding the index lock walks the
+# NAS; the others re-read its snapshot file this often
+NAS_INDEX_FOLLOW_INTERVAL = float(os.environ.get("NAS_INDEX_FOLLOW_INTERVAL", "30"))
+
+# Every Nth pass ignores directory mtimes, to pick up files rewritten in place
+NAS_INDEX_FULL_EVERY = int(os.environ.get("NAS_INDEX_FULL_EVERY", "24"))
+
+# File-type categories by extension
+EXTENSIONS_MAP = {
+    "video": {".mp4", ".mkv", ".avi", ".mov", ".wmv", ".flv"},
+    "music": {".mp3", ".flac", ".wav", ".aac", ".ogg", ".m4a"},
+    "images": {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"},
+    "documents": {".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt", ".py"},
+    "archives": {".zip", ".rar", ".7z", ".tar", ".gz"},
+}
+
+_EXT_TO_CATEGORY = {ext: category for category, exts in EXTENSIONS_MAP.items() for ext in exts}
+
+
+def categorise(fname):
+    """Return the file-type category for a file name ('other' if unknown)."""
+    ext = os.path.splitext(fname)[1].lower()
+    return _EXT_TO_CATEGORY.get(ext, "other")
+
+
+def _scan_dir(path):
+    """List one directory: returns (sizes_by_category, subdir_names)."""
+    sizes = {}
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    # Same as os.walk: symlinked dirs are listed but not descended
+                    if not entry.is_symlink():
+                        subdirs.append(entry.name)
+                    continue
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            category = categorise(entry.name)
+            sizes[category] = sizes.get(category, 0) + size
+    return sizes, subdirs
+
+
+class NasIndexer:
+    """
+    Background indexer for per-category byte totals under NAS_PATH.
+
+    Each pass stats every directory but only re-lists the ones whose mtime
+    changed since the previous pass. The result is persisted to
+    NAS_INDEX_FILE so the dashboard has numbers straight after a restart.
+
+    Under a multi-worker server every worker starts an indexer thread, but
+    only the one that holds an exclusive lock on NAS_INDEX_FILE.lock walks
+    the disk; the rest reload the snapshot it writes, and take over if the
+    leader's process exits.
+    """
+
+    def __init__(self, root=NAS_PATH, snapshot_path=NAS_INDEX_FILE,
+                 interval=NAS_INDEX_INTERVAL, full_every=NAS_INDEX_FULL_EVERY):
+        self.root = root
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.full_every = max(1, full_every)
+        self._lock = threading.Lock()
+        self._indexer = ProcessThread(self._run, "nas-indexer")
+        self._leader = LeaderLock(snapshot_path + LOCK_SUFFIX)
+        self._snapshot_mtime = None
+        self._snapshot = self._load_snapshot()
+
+    # ───────── Snapshot persistence ─────────
+    def _load_snapshot(self):
+        try:
+            self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+            with open(self.snapshot_path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if data.get("root") != self.root:
+            return {}
+        return data
+
+    def _save_snapshot(self, snapshot):
+        # Only the leader writes, and it already holds the lock file
+        try:
+            atomic_write(self.snapshot_path, json.dumps(snapshot))
+            self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            pass
+
+    # ───────── Indexing ─────────
+    def refresh(self):
+        """Run one indexing pass and return the new snapshot."""
+        previous = self._snapshot
+        passes = previous.get("passes", 0) + 1
+        full = passes % self.full_every == 0
+        old_dirs = {} if full else previous.get("dirs", {})
+
+        started = time.time()
+        dirs = {}
+        totals = {category: 0 for category in EXTENSIONS_MAP}
+        totals["other"] = 0
+        rescanned = 0
+
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            old = old_dirs.get(path)
+            if old and old["m"] == mtime:
+                sizes, subdirs = old["s"], old["d"]
+            else:
+                try:
+                    sizes, subdirs = _scan_dir(path)
+                except OSError:
+                    continue
+                rescanned += 1
+
+            dirs[path] = {"m": mtime, "s": sizes, "d": subdirs}
+            for category, size in sizes.items():
+                totals[category] = totals.get(category, 0) + size
+            stack.extend(os.path.join(path, name) for name in subdirs)
+
+        perf.observe("nas_walk", (time.time() - started) * 1000, request_timing=False)
+        snapshot = {
+            "root": self.root,
+            "indexed_at": time.time(),
+            "duration": round(time.time() - started, 2),
+            "passes": passes,
+            "dir_count": len(dirs),
+            "rescanned": rescanned,
+            "totals": totals,
+            "dirs": dirs,
+        }
+        self._snapshot = snapshot
+        self._save_snapshot(snapshot)
+        return snapshot
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._snapshot_mtime:
+            snapshot = self._load_snapshot()
+            if snapshot:
+                self._snapshot = snapshot
+
+    def _run(self):
+        while True:
+            if not self._leader.held():
+                # Another worker is indexing; use what it writes
+                self._reload_if_changed()
+                time.sleep(NAS_INDEX_FOLLOW_INTERVAL)
+                continue
+            if os.path.isdir(self.root):
+                try:
+                    self._reload_if_changed()
+                    self.refresh()
+                except Exception:
+                    # Never let a bad pass kill the indexer thread
+                    pass
+            time.sleep(self.interval)
+
+    def ensure_running(self):
+        """Start the indexer thread in this process if it isn't running yet."""
+        self._indexer.start()
+
+    def snapshot(self):
+        """Return the latest totals without touching the disk."""
+        self.ensure_running()
+        snap = self._snapshot
+        indexed_at = snap.get("indexed_at")
+        return {
+            "totals": dict(snap.get("totals") or {}),
+            "indexed_at": indexed_at,
+            "age_seconds": (time.time() - indexed_at) if indexed_at else None,
+            "duration": snap.get("duration"),
+            "dir_count": snap.get("dir_count", 0),
+        }
+
+
+def format_age(seconds):
+    """Short human label for an age in seconds, e.g. '5 min ago'."""
+    if seconds is None:
+        return "never"
+    seconds = int(max(0, seconds))
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds // 60} min ago"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {(seconds % 3600) // 60}m ago"
+    return f"{seconds // 86400}d ago"
+
+
+nas_indexer = NasIndexer()
@@ -0,0 +1,318 @@
+import os
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from basecamp_locking import atomic_write, file_lock, read_json_locked
+from basecamp_threads import ProcessThread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ───────────── Office Notify (ESP32-C3) ─────────────
+OFFICE_NOTIFY_BASE = os.environ.get("OFFICE_NOTIFY_BASE", "http://office-notify.local")
+OFFICE_NOTIFY_TIMEOUT = float(os.environ.get("OFFICE_NOTIFY_TIMEOUT", "1.5"))
+
+# How long a /status answer is reused by every tab polling it
+OFFICE_NOTIFY_STATUS_TTL = float(os.environ.get("OFFICE_NOTIFY_STATUS_TTL", "3"))
+
+# Consecutive failures before we stop calling the device and answer "offline"
+OFFICE_NOTIFY_FAILURE_THRESHOLD = int(os.environ.get("OFFICE_NOTIFY_FAILURE_THRESHOLD", "3"))
+
+# Seconds between background probes while the device is considered offline
+OFFICE_NOTIFY_PROBE_INTERVAL = float(os.environ.get("OFFICE_NOTIFY_PROBE_INTERVAL", "15"))
+
+# Background send queue: size, retries with exponential backoff, and the
+# window in which repeated presses of the same message collapse into one
+OFFICE_NOTIFY_QUEUE_SIZE = int(os.environ.get("OFFICE_NOTIFY_QUEUE_SIZE", "32"))
+OFFICE_NOTIFY_MAX_ATTEMPTS = int(os.environ.get("OFFICE_NOTIFY_MAX_ATTEMPTS", "5"))
+OFFICE_NOTIFY_RETRY_BASE = float(os.environ.get("OFFICE_NOTIFY_RETRY_BASE", "1"))
+OFFICE_NOTIFY_DEDUPE_WINDOW = float(os.environ.get("OFFICE_NOTIFY_DEDUPE_WINDOW", "10"))
+
+# Delivery records kept for the status endpoint
+OFFICE_NOTIFY_DELIVERY_HISTORY = 200
+
+# Delivery records shared by every worker, so any of them can answer a poll
+OFFICE_NOTIFY_DELIVERY_FILE = os.environ.get("OFFICE_NOTIFY_DELIVERY_FILE",
+                                             os.path.join(BASE_DIR, "office_notify_deliveries.json"))
+
+
+class OfficeNotifyUnavailable(Exception):
+    """Raised instead of calling the device while the circuit breaker is open."""
+
+
+class OfficeNotifyClient:
+    """
+    Keep-alive HTTP client for the office-notify ESP32.
+
+    - one pooled requests.Session per process
+    - concurrent status polls share a single in-flight request
+    - status answers are cached for a few seconds
+    - after repeated failures the breaker opens: calls answer "offline"
+      immediately and a background thread probes /status until it recovers
+    """
+
+    def __init__(self, base_url=OFFICE_NOTIFY_BASE, timeout=OFFICE_NOTIFY_TIMEOUT,
+                 status_ttl=OFFICE_NOTIFY_STATUS_TTL,
+                 failure_threshold=OFFICE_NOTIFY_FAILURE_THRESHOLD,
+                 probe_interval=OFFICE_NOTIFY_PROBE_INTERVAL):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.status_ttl = status_ttl
+        self.failure_threshold = max(1, failure_threshold)
+        self.probe_interval = probe_interval
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+
+        self._status = (False, None)
+        self._status_at = None
+        self._inflight = None
+
+        self._failures = 0
+        self._open = False
+        self._prober = None
+
+    # ───────── Connection pool ─────────
+    def _get_session(self):
+        # Sockets must not be shared with a parent process after fork
+        if self._session is None or self._pid != os.getpid():
+            # Imported here: requests is slow to import and only needed once the device is contacted
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._session = session
+            self._pid = os.getpid()
+        return self._session
+
+    def _get(self, path, params=None):
+        r = self._get_session().get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r
+
+    # ───────── Circuit breaker ─────────
+    @property
+    def is_open(self):
+        return self._open
+
+    def _record_success(self, payload=None, cache_status=False):
+        with self._lock:
+            self._failures = 0
+            self._open = False
+            if cache_status:
+                self._status = (True, payload)
+                self._status_at = time.monotonic()
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._status = (False, None)
+            self._status_at = time.monotonic()
+            if self._failures >= self.failure_threshold and not self._open:
+                self._open = True
+                self._start_prober()
+
+    def _start_prober(self):
+        if self._prober is not None and self._prober.is_alive():
+            return
+        self._prober = threading.Thread(target=self._probe_loop, name="office-notify-probe", daemon=True)
+        self._prober.start()
+
+    def _probe_loop(self):
+        while self._open:
+            time.sleep(self.probe_interval)
+            try:
+                payload = self._get("/status").json()
+            except Exception:
+                continue
+            self._record_success(payload, cache_status=True)
+
+    # ───────── Public API ─────────
+    def fetch_status(self):
+        """Return (online_bool, payload_or_none)."""
+        if self._open:
+            return False, None
+
+        with self._lock:
+            if self._status_at is not None and time.monotonic() - self._status_at < self.status_ttl:
+                return self._status
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            # Someone else is already asking the device; share their answer
+            inflight.wait(self.timeout + 1)
+            return self._status
+
+        try:
+            payload = self._get("/status").json()
+        except Exception:
+            self._record_failure()
+        else:
+            self._record_success(payload, cache_status=True)
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+        return self._status
+
+    def send(self, msg):
+        """Ask the device to show `msg`. Raises on failure."""
+        if self._open:
+            raise OfficeNotifyUnavailable("office-notify is offline")
+        try:
+            self._get("/notify", params={"msg": msg})
+        except Exception:
+            self._record_failure()
+            raise
+        self._record_success()
+
+
+class NotifySendQueue:
+    """
+    Bounded background queue of office-notify sends.
+
+    submit() returns at once with a delivery record; a worker thread calls
+    the device, retrying with exponential backoff. Sending the same message
+    again within the dedupe window returns the existing delivery instead of
+    queueing another one (unless that one failed).
+
+    The queue and its sender thread belong to the worker that took the
+    request, but delivery records live in a small locked JSON file, so a
+    poll answered by another worker (or a press deduped against another
+    worker's send) sees the same state.
+    """
+
+    def __init__(self, client, maxsize=OFFICE_NOTIFY_QUEUE_SIZE,
+                 max_attempts=OFFICE_NOTIFY_MAX_ATTEMPTS, retry_base=OFFICE_NOTIFY_RETRY_BASE,
+                 dedupe_window=OFFICE_NOTIFY_DEDUPE_WINDOW, history=OFFICE_NOTIFY_DELIVERY_HISTORY,
+                 path=OFFICE_NOTIFY_DELIVERY_FILE):
+        self.client = client
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.dedupe_window = dedupe_window
+        self.history = history
+        self.path = path
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._sender = ProcessThread(self._run, "office-notify-sender")
+
+    def _ensure_running(self):
+        self._sender.start()
+
+    # ───────── Shared records ─────────
+    def _read(self):
+        data = read_json_locked(self.path, {})
+        return data if isinstance(data, dict) else {}
+
+    def _change(self, change):
+        """Apply `change(deliveries)` to the shared file under its lock; returns change's result."""
+        with file_lock(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    deliveries = json.load(f)
+            except (OSError, ValueError):
+                deliveries = {}
+            if not isinstance(deliveries, dict):
+                deliveries = {}
+            result = change(deliveries)
+            # Oldest first (insertion order), so trim from the front
+            for delivery_id in list(deliveries)[:max(0, len(deliveries) - self.history)]:
+                del deliveries[delivery_id]
+            atomic_write(self.path, json.dumps(deliveries))
+        return result
+
+    def _update(self, record, **changes):
+        with self._lock:
+            record.update(changes)
+            record["updated_at"] = datetime.now().isoformat(timespec="seconds")
+            snapshot = dict(record)
+
+        def change(deliveries):
+            deliveries[snapshot["id"]] = snapshot
+        try:
+            self._change(change)
+        except OSError:
+            # The device still gets the message; pollers just see stale state
+            pass
+
+    def submit(self, msg, username=None):
+        """
+        Queue `msg` for delivery. Returns (record, duplicate); record is None
+        when the queue is full.
+        """
+        now = time.time()
+        stamp = datetime.now().isoformat(timespec="seconds")
+        record = {
+            "id": uuid.uuid4().hex,
+            "msg": msg,
+            "username": username,
+            "state": "queued",
+            "attempts": 0,
+            "error": None,
+            "created_at": stamp,
+            "updated_at": stamp,
+            "queued_ts": now,
+        }
+
+        def change(deliveries):
+            for existing in reversed(list(deliveries.values())):
+                if (existing.get("msg") == msg and existing.get("state") != "failed"
+                        and now - existing.get("queued_ts", 0) < self.dedupe_window):
+                    return dict(existing), True
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                return None, False
+            deliveries[record["id"]] = dict(record)
+            return dict(record), False
+
+        with self._lock:
+            try:
+                result = self._change(change)
+            except OSError:
+                # Shared file unusable: the send still goes out if it was queued
+                result = (dict(record), False) if record in self._queue.queue else (None, False)
+            if result[0] is not None and not result[1]:
+                self._ensure_running()
+        return result
+
+    def get(self, delivery_id):
+        """Return a copy of a delivery record, or None if unknown."""
+        record = self._read().get(delivery_id)
+        return dict(record) if isinstance(record, dict) else None
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _deliver(self, record):
+        for attempt in range(1, self.max_attempts + 1):
+            self._update(record, state="sending", attempts=attempt)
+            try:
+                self.client.send(record["msg"])
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self._update(record, state="failed", error=str(e))
+                    return
+                self._update(record, state="retrying", error=str(e))
+                time.sleep(self.retry_base * (2 ** (attempt - 1)))
+            else:
+                self._update(record, state="delivered", error=None)
+                return
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self._deliver(record)
+            except Exception as e:
+                self._update(record, state="failed", error=str(e))
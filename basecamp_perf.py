@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# Record per-route and per-probe latencies in memory
+PERF_ENABLED = os.environ.get("PERF_ENABLED", "1") == "1"
+
+# Also describe each response's timings in a Server-Timing header
+PERF_SERVER_TIMING = os.environ.get("PERF_SERVER_TIMING", "1") == "1"
+
+# Histogram bucket upper bounds in ms: 0.05 ms to ~2 min, each 25% wider than
+# the last. Percentiles are read off the buckets, so they're within ~12%.
+PERF_BUCKETS = [0.05 * 1.25 ** i for i in range(67)]
+
+PERF_PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; constant memory however many samples."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(PERF_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect_left(PERF_BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                # The bucket's upper bound, but never above the slowest sample
+                return min(PERF_BUCKETS[i], self.max) if i < len(PERF_BUCKETS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 2) if self.count else None,
+            "max_ms": round(self.max, 2),
+            **{f"p{pct}_ms": round(self.percentile(pct), 2) if self.count else None for pct in PERF_PERCENTILES},
+        }
+
+
+class PerfRecorder:
+    """
+    In-process latency histograms for routes and named timings.
+
+    Request hooks time every view (keyed by endpoint); timer() and observe()
+    record named sections such as collector probes, log reads and template
+    rendering. Sections measured while handling a request are also listed
+    in that response's Server-Timing header. Each worker process keeps its
+    own numbers.
+    """
+
+    def __init__(self, enabled=PERF_ENABLED, server_timing=PERF_SERVER_TIMING):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._timings = {}
+        self.started_at = time.time()
+
+    # ───────── Recording ─────────
+    def _observe(self, table, name, ms):
+        with self._lock:
+            histogram = table.get(name)
+            if histogram is None:
+                histogram = table[name] = Histogram()
+            histogram.observe(ms)
+
+    def observe(self, name, ms, desc=None, request_timing=True):
+        """Record `ms` under `name`; also list it in Server-Timing when inside a request."""
+        if not self.enabled:
+            return
+        self._observe(self._timings, name, ms)
+        if request_timing and has_request_context():
+            timings = g.get("perf_timings")
+            if timings is not None:
+                timings.append((name, ms, desc))
+
+    @contextmanager
+    def timer(self, name, desc=None):
+        """Time the with-block as `name`."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000, desc)
+
+    # ───────── Request hooks ─────────
+    def before_request(self):
+        if self.enabled:
+            g.perf_started = time.perf_counter()
+            g.perf_timings = []
+            g.perf_render_stack = []
+
+    def after_request(self, response):
+        started = g.get("perf_started") if self.enabled else None
+        if started is None:
+            return response
+        total = (time.perf_counter() - started) * 1000
+        self._observe(self._routes, request.endpoint or "<unmatched>", total)
+
+        if self.server_timing:
+            metrics = []
+            for name, ms, desc in g.perf_timings:
+                metric = f"{name};dur={ms:.1f}"
+                if desc:
+                    metric += f';desc="{desc}"'
+                metrics.append(metric)
+            metrics.append(f"total;dur={total:.1f}")
+            response.headers.add("Server-Timing", ", ".join(metrics))
+        return response
+
+    def render_started(self, sender, template, context, **extra):
+        """before_render_template signal handler."""
+        if self.enabled and has_request_context():
+            stack = g.get("perf_render_stack")
+            if stack is not None:
+                stack.append(time.perf_counter())
+
+    def render_finished(self, sender, template, context, **extra):
+        """template_rendered signal handler; nested renders count toward the outer one."""
+        if not self.enabled or not has_request_context():
+            return
+        stack = g.get("perf_render_stack")
+        if not stack:
+            return
+        started = stack.pop()
+        if not stack:
+            self.observe("render", (time.perf_counter() - started) * 1000)
+
+    # ───────── Reading ─────────
+    def snapshot(self):
+        """{"routes": {...}, "timings": {...}} of histogram summaries, slowest p95 first."""
+        with self._lock:
+            routes = {name: h.snapshot() for name, h in self._routes.items()}
+            timings = {name: h.snapshot() for name, h in self._timings.items()}
+
+        def ordered(table):
+            return dict(sorted(table.items(), key=lambda item: -(item[1]["p95_ms"] or 0)))
+
+        return {
+            "pid": os.getpid(),
+            "since": self.started_at,
+            "routes": ordered(routes),
+            "timings": ordered(timings),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._timings.clear()
+            self.started_at = time.time()
+
+
+perf = PerfRecorder()
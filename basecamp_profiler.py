@@ -0,0 +1,212 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+
+from flask import g, request, session
+
+from basecamp_core import BASE_DIR
+from basecamp_locking import atomic_write, file_lock
+
+# Saved profiles (cProfile/pstats format: load with pstats.Stats(path) or snakeviz)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+
+# Seconds between checks of the armed file, so idle cost is a clock read
+PROFILE_ARM_POLL = 1.0
+
+# Query parameter an admin adds to profile one request
+PROFILE_QUERY_ARG = "_profile"
+
+PROFILE_SUFFIX = ".prof"
+
+
+def _safe_name(text):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", text)[:60]
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile runs of single requests.
+
+    A request is profiled when an admin adds ?_profile=1, or when its
+    endpoint has been armed for the next N requests (arm() writes a small
+    file every worker polls). Otherwise the hooks only compare a clock
+    reading and check a dict, so it can stay enabled in production.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        # Requests to profile next, per endpoint; shared by every worker
+        self.arm_file = os.path.join(directory, "armed.json")
+        self._lock = threading.Lock()
+        self._armed = {}
+        self._armed_mtime = None
+        self._checked_at = 0.0
+
+    # ───────── Arming ─────────
+    def _refresh_armed(self):
+        now = time.monotonic()
+        if now - self._checked_at < PROFILE_ARM_POLL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.arm_file).st_mtime_ns
+        except OSError:
+            self._armed, self._armed_mtime = {}, None
+            return
+        if mtime != self._armed_mtime:
+            self._armed = self._read_armed()
+            self._armed_mtime = mtime
+
+    def _read_armed(self):
+        try:
+            with open(self.arm_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {endpoint: int(n) for endpoint, n in data.items() if int(n) > 0}
+
+    def _update_armed(self, change):
+        """Apply `change(armed)` to the shared file under its lock; returns change's result."""
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.arm_file):
+            armed = self._read_armed()
+            result = change(armed)
+            atomic_write(self.arm_file, json.dumps({k: v for k, v in armed.items() if v > 0}))
+        with self._lock:
+            self._armed = {k: v for k, v in armed.items() if v > 0}
+            self._armed_mtime = None
+            self._checked_at = 0.0
+        return result
+
+    def arm(self, endpoint, count):
+        """Profile the next `count` requests to `endpoint` (0 disarms it)."""
+        def change(armed):
+            armed[endpoint] = max(0, int(count))
+        self._update_armed(change)
+
+    def armed(self):
+        with self._lock:
+            self._refresh_armed()
+            return dict(self._armed)
+
+    def _take(self, endpoint):
+        """Use up one armed run for `endpoint`; False if another worker took the last."""
+        def change(armed):
+            if armed.get(endpoint, 0) <= 0:
+                return False
+            armed[endpoint] -= 1
+            return True
+        try:
+            return self._update_armed(change)
+        except OSError:
+            return False
+
+    # ───────── Request hooks ─────────
+    def _wanted(self):
+        if request.args.get(PROFILE_QUERY_ARG) == "1" and session.get("role") == "admin":
+            return True
+        endpoint = request.endpoint
+        if endpoint is None:
+            return False
+        with self._lock:
+            self._refresh_armed()
+            if not self._armed.get(endpoint):
+                return False
+        return self._take(endpoint)
+
+    def before_request(self):
+        if not self._wanted():
+            return
+        import cProfile
+
+        # cProfile hooks only this thread, which is the one serving the request
+        profile = cProfile.Profile()
+        g.profile = profile
+        g.profile_started = time.perf_counter()
+        profile.enable()
+
+    def after_request(self, response):
+        name = self._finish()
+        if name:
+            response.headers["X-Profile"] = name
+        return response
+
+    def teardown_request(self, exc=None):
+        # Still running if the request failed before after_request
+        self._finish()
+
+    def _finish(self):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return None
+        profile.disable()
+        elapsed_ms = (time.perf_counter() - g.pop("profile_started")) * 1000
+        try:
+            return self._save(profile, elapsed_ms)
+        except OSError:
+            return None
+
+    # ───────── Files ─────────
+    def _save(self, profile, elapsed_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        name = (f"{stamp}-{_safe_name(request.endpoint or 'unmatched')}"
+                f"-{os.getpid()}-{int(elapsed_ms)}ms{PROFILE_SUFFIX}")
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path)
+        self._prune()
+        return name
+
+    def _prune(self):
+        profiles = self.list()
+        for entry in profiles[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, entry["name"]))
+            except OSError:
+                pass
+
+    def list(self):
+        """Saved profiles, newest first: [{"name", "size", "modified"}]."""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(PROFILE_SUFFIX)]
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append({"name": name, "size": st.st_size, "modified": st.st_mtime})
+        entries.sort(key=lambda entry: entry["modified"], reverse=True)
+        return entries
+
+    def path_for(self, name):
+        """Absolute path of a saved profile, or None for anything that isn't one."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def summary(self, name, sort="cumulative", limit=40):
+        """pstats text report of a saved profile, or None if it doesn't exist."""
+        import io
+        import pstats
+
+        path = self.path_for(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+request_profiler = RequestProfiler()
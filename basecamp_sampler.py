@@ -0,0 +1,146 @@
+import os
+import json
+import threading
+import time
+from collections import deque
+
+from basecamp_locking import LOCK_SUFFIX, LeaderLock, atomic_write
+from basecamp_threads import ProcessThread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds between samples
+STATS_SAMPLE_INTERVAL = float(os.environ.get("STATS_SAMPLE_INTERVAL", "5"))
+
+# Samples kept in memory (720 x 5s = one hour)
+STATS_SAMPLE_HISTORY = int(os.environ.get("STATS_SAMPLE_HISTORY", "720"))
+
+# Latest sample, shared between workers: only the worker holding
+# STATS_SAMPLE_FILE.lock samples, the rest copy each new one from here
+STATS_SAMPLE_FILE = os.environ.get("STATS_SAMPLE_FILE", os.path.join(BASE_DIR, "stats_sample.json"))
+
+
+class StatsSampler:
+    """
+    One shared background thread that samples CPU load plus any registered
+    probes (temperatures etc.) into a fixed-size ring buffer.
+
+    Request handlers call latest(), which is a plain deque lookup and never
+    blocks on psutil or sysfs.
+
+    Under several workers only the one holding the leader lock samples; it
+    writes each sample to `sample_path` and the others append it to their
+    own ring buffer, so every worker reports the same numbers.
+    """
+
+    def __init__(self, interval=STATS_SAMPLE_INTERVAL, history=STATS_SAMPLE_HISTORY,
+                 sample_path=STATS_SAMPLE_FILE):
+        self.interval = interval
+        self.sample_path = sample_path
+        self._leader = LeaderLock(sample_path + LOCK_SUFFIX)
+        self._leading = False
+        self._history = deque(maxlen=max(1, history))
+        self._probes = {}
+        self._lock = threading.Lock()
+        self._sampler = ProcessThread(self._run, "stats-sampler")
+
+    def register(self, name, func):
+        """Add a probe; its return value is stored under `name` in every sample."""
+        self._probes[name] = func
+
+    def sample_once(self):
+        """Take one sample, append it to the ring buffer and return it."""
+        import psutil
+
+        sample = {"ts": time.time()}
+        try:
+            # interval=None compares against the previous call, so it never sleeps
+            sample["cpu_percent"] = round(psutil.cpu_percent(interval=None), 1)
+            sample["per_core"] = [round(p, 1) for p in psutil.cpu_percent(interval=None, percpu=True)]
+        except Exception:
+            sample["cpu_percent"] = None
+            sample["per_core"] = []
+
+        for name, func in list(self._probes.items()):
+            try:
+                sample[name] = func()
+            except Exception:
+                sample[name] = None
+
+        self._history.append(sample)
+        return sample
+
+    def _prime(self):
+        # Prime psutil's counters so the first real sample has a baseline
+        try:
+            import psutil
+
+            psutil.cpu_percent(interval=None)
+            psutil.cpu_percent(interval=None, percpu=True)
+        except Exception:
+            pass
+        time.sleep(min(1.0, self.interval))
+
+    def _publish(self, sample):
+        try:
+            # Rewritten every interval; a restart just samples again
+            atomic_write(self.sample_path, json.dumps(sample), durable=False)
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def _follow(self):
+        """Append the leader's latest sample if it is newer than ours."""
+        try:
+            with open(self.sample_path, "r") as f:
+                sample = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(sample, dict) or not isinstance(sample.get("ts"), (int, float)):
+            return
+        try:
+            newest = self._history[-1]["ts"]
+        except IndexError:
+            newest = 0
+        if sample["ts"] > newest:
+            self._history.append(sample)
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                if self._leader.held():
+                    if not self._leading:
+                        # Just took over (or first start)
+                        self._leading = True
+                        self._prime()
+                        started = time.monotonic()
+                    self._publish(self.sample_once())
+                else:
+                    self._leading = False
+                    self._follow()
+            except Exception:
+                pass
+            elapsed = time.monotonic() - started
+            time.sleep(max(0.0, self.interval - elapsed))
+
+    def ensure_running(self):
+        """Start the sampler thread in this process if it isn't running yet."""
+        self._sampler.start()
+
+    def latest(self):
+        """Return the newest sample, or None if nothing has been sampled yet."""
+        self.ensure_running()
+        try:
+            return self._history[-1]
+        except IndexError:
+            return None
+
+    def history(self, limit=None):
+        """Return up to `limit` samples, oldest first."""
+        samples = list(self._history)
+        if limit is not None:
+            samples = samples[-limit:]
+        return samples
+
+
+stats_sampler = StatsSampler()
@@ -0,0 +1,176 @@
+import os
+import glob
+import json
+import threading
+import time
+
+from basecamp_locking import LOCK_SUFFIX, LeaderLock, atomic_write
+from basecamp_threads import ProcessThread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Root of the sysfs tree; point at a fake tree for testing
+SYSFS_ROOT = os.environ.get("SYSFS_ROOT", "/sys")
+
+# Seconds between re-globbing sysfs for added/removed sensors
+SENSOR_REDISCOVER_INTERVAL = float(os.environ.get("SENSOR_REDISCOVER_INTERVAL", "300"))
+
+# Seconds between DS18B20 reads (each conversion takes ~750ms)
+DS18B20_READ_INTERVAL = float(os.environ.get("DS18B20_READ_INTERVAL", "10"))
+
+# Readings older than this are treated as missing
+DS18B20_MAX_AGE = float(os.environ.get("DS18B20_MAX_AGE", "120"))
+
+# Readings shared between workers: only the worker holding
+# DS18B20_READINGS_FILE.lock reads the bus, the rest load this file
+DS18B20_READINGS_FILE = os.environ.get("DS18B20_READINGS_FILE", os.path.join(BASE_DIR, "ds18b20_readings.json"))
+
+# Value a DS18B20 reports before its first conversion, never a real reading
+DS18B20_POWER_ON_RESET = 85000
+
+
+def parse_w1_slave(content):
+    """
+    Parse a DS18B20 w1_slave file and return degrees C, or None if the
+    CRC line doesn't end in YES or the reading is missing/bogus.
+
+        72 01 4b 46 7f ff 0e 10 57 : crc=57 YES
+        72 01 4b 46 7f ff 0e 10 57 t=23125
+    """
+    lines = [line.strip() for line in content.strip().split("\n") if line.strip()]
+    if len(lines) < 2 or not lines[0].endswith("YES"):
+        return None
+    if "t=" not in lines[1]:
+        return None
+    try:
+        temp_millidegrees = int(lines[1].split("t=")[-1].strip())
+    except ValueError:
+        return None
+    if temp_millidegrees == DS18B20_POWER_ON_RESET:
+        return None
+    return round(temp_millidegrees / 1000.0, 1)
+
+
+class SensorRegistry:
+    """
+    Discovers thermal zones and 1-Wire DS18B20 sensors under SYSFS_ROOT once
+    (then every SENSOR_REDISCOVER_INTERVAL) and reads every DS18B20 on a
+    background thread, so callers only ever see cached values.
+
+    Each read holds the bus for ~750ms per sensor, so under several workers
+    only the one holding the leader lock reads it and publishes the readings
+    to `readings_path`; the others load that file instead.
+    """
+
+    def __init__(self, sysfs_root=SYSFS_ROOT, rediscover_interval=SENSOR_REDISCOVER_INTERVAL,
+                 read_interval=DS18B20_READ_INTERVAL, max_age=DS18B20_MAX_AGE,
+                 readings_path=DS18B20_READINGS_FILE):
+        self.sysfs_root = sysfs_root
+        self.readings_path = readings_path
+        self._leader = LeaderLock(readings_path + LOCK_SUFFIX)
+        self._readings_mtime = None
+        self.rediscover_interval = rediscover_interval
+        self.read_interval = read_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thermal_zones = []
+        self._w1_devices = {}
+        self._readings = {}
+        self._discovered_at = None
+        self._reader = ProcessThread(self._run, "ds18b20-reader")
+
+    # ───────── Discovery ─────────
+    def discover(self):
+        """Glob sysfs for sensors; returns (thermal_zone_paths, {device_id: w1_slave_path})."""
+        zones = sorted(glob.glob(os.path.join(self.sysfs_root, "class/thermal/thermal_zone*/temp")))
+        devices = {}
+        for path in sorted(glob.glob(os.path.join(self.sysfs_root, "bus/w1/devices/28-*/w1_slave"))):
+            devices[os.path.basename(os.path.dirname(path))] = path
+
+        with self._lock:
+            self._thermal_zones = zones
+            self._w1_devices = devices
+            # Forget readings from sensors that have gone away
+            self._readings = {k: v for k, v in self._readings.items() if k in devices}
+            self._discovered_at = time.monotonic()
+        return zones, devices
+
+    def _maybe_rediscover(self):
+        if self._discovered_at is None or time.monotonic() - self._discovered_at >= self.rediscover_interval:
+            self.discover()
+
+    def thermal_zones(self):
+        self._maybe_rediscover()
+        return list(self._thermal_zones)
+
+    def w1_devices(self):
+        self._maybe_rediscover()
+        return dict(self._w1_devices)
+
+    # ───────── DS18B20 reader ─────────
+    def read_ds18b20_once(self):
+        """Read every known DS18B20 now; invalid reads keep the previous value."""
+        for device_id, path in self.w1_devices().items():
+            try:
+                with open(path, "r") as f:
+                    celsius = parse_w1_slave(f.read())
+            except OSError:
+                continue
+            if celsius is None:
+                continue
+            with self._lock:
+                self._readings[device_id] = {"celsius": celsius, "read_at": time.time()}
+
+    def _publish(self):
+        with self._lock:
+            data = json.dumps(self._readings)
+        try:
+            # Rewritten every read; a restart just reads the bus again
+            atomic_write(self.readings_path, data, durable=False)
+        except OSError:
+            pass
+
+    def _follow(self):
+        """Load the leader's readings if the file changed since last time."""
+        try:
+            mtime = os.stat(self.readings_path).st_mtime_ns
+            if mtime == self._readings_mtime:
+                return
+            with open(self.readings_path, "r") as f:
+                readings = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(readings, dict):
+            with self._lock:
+                self._readings = readings
+            self._readings_mtime = mtime
+
+    def _run(self):
+        while True:
+            try:
+                if self._leader.held():
+                    self.read_ds18b20_once()
+                    self._publish()
+                else:
+                    self._follow()
+            except Exception:
+                pass
+            time.sleep(self.read_interval)
+
+    def ensure_running(self):
+        """Start the DS18B20 reader thread in this process if it isn't running yet."""
+        self._reader.start()
+
+    def ds18b20_readings(self):
+        """Return {device_id: celsius} for every sensor with a recent valid reading."""
+        self.ensure_running()
+        now = time.time()
+        with self._lock:
+            return {
+                device_id: reading["celsius"]
+                for device_id, reading in sorted(self._readings.items())
+                if now - reading["read_at"] <= self.max_age
+            }
+
+
+sensors = SensorRegistry()
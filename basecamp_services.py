@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+# How long one `systemctl show` result is reused across requests
+SERVICE_STATUS_TTL = float(os.environ.get("SERVICE_STATUS_TTL", "5"))
+SERVICE_STATUS_TIMEOUT = float(os.environ.get("SERVICE_STATUS_TIMEOUT", "2"))
+
+SHOW_PROPERTIES = ["Id", "ActiveState", "SubState", "ActiveEnterTimestamp", "MainPID", "MemoryCurrent"]
+
+# systemd prints UINT64_MAX when a counter isn't available
+_UNSET_U64 = str(2 ** 64 - 1)
+
+
+def _status_from_active_state(active_state):
+    """Map systemd's ActiveState to 'running', 'stopped' or 'unknown'."""
+    if active_state == "active":
+        return "running"
+    elif active_state in ["inactive", "failed"]:
+        return "stopped"
+    else:
+        return "unknown"
+
+
+def _parse_int(value):
+    if not value or value == "[not set]" or value == _UNSET_U64:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_systemctl_show(output):
+    """Split `systemctl show` output into one property dict per unit, in order."""
+    blocks = []
+    current = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = {}
+            continue
+        key, _, value = line.partition("=")
+        current[key] = value
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def query_services(services, timeout=SERVICE_STATUS_TIMEOUT):
+    """Query every configured unit with a single `systemctl show` call."""
+    import subprocess
+
+    units = [service["unit"] for service in services]
+    blocks = []
+    if units:
+        try:
+            result = subprocess.run(
+                ["systemctl", "show", "--no-pager", "--property=" + ",".join(SHOW_PROPERTIES), *units],
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+            )
+            blocks = parse_systemctl_show(result.stdout)
+        except (subprocess.TimeoutExpired, FileNotFoundError, Exception):
+            blocks = []
+
+    by_id = {block.get("Id"): block for block in blocks}
+    statuses = []
+    for idx, service in enumerate(services):
+        # Blocks come back in argument order; fall back to that if the Id was aliased
+        props = by_id.get(service["unit"])
+        if props is None and len(blocks) == len(units):
+            props = blocks[idx]
+        props = props or {}
+
+        main_pid = _parse_int(props.get("MainPID"))
+        statuses.append({
+            "label": service["label"],
+            "unit": service["unit"],
+            "status": _status_from_active_state(props.get("ActiveState", "").lower()),
+            "active_state": props.get("ActiveState") or None,
+            "sub_state": props.get("SubState") or None,
+            "since": props.get("ActiveEnterTimestamp") or None,
+            "main_pid": main_pid or None,
+            "memory_bytes": _parse_int(props.get("MemoryCurrent")),
+        })
+    return statuses
+
+
+class ServiceStatusCache:
+    """
+    Short-TTL cache around query_services().
+
+    Only one thread refreshes at a time; requests that arrive while a
+    refresh is running wait for it and share its result.
+    """
+
+    def __init__(self, services, ttl=SERVICE_STATUS_TTL):
+        self.services = services
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._statuses = None
+        self._fetched_at = 0.0
+
+    def _fresh(self):
+        return self._statuses is not None and (time.monotonic() - self._fetched_at) < self.ttl
+
+    def get(self):
+        if self._fresh():
+            return self._statuses
+        with self._lock:
+            if not self._fresh():
+                self._statuses = query_services(self.services)
+                self._fetched_at = time.monotonic()
+            return self._statuses
+
+    def invalidate(self):
+        self._fetched_at = 0.0
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that should only be imported when first used; listed in the report
+# if a change makes them load at startup again
+LAZY_MODULES = ("requests", "psutil", "sqlite3", "subprocess")
+
+TIMING_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app as appmod
+imported = time.perf_counter()
+fresh = appmod.create_app()
+built = time.perf_counter()
+client = fresh.test_client()
+client.get("/login")
+first_request = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (built - imported) * 1000,
+    "first_request_ms": (first_request - built) * 1000,
+    "eager_modules": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def _run_python(args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # Header line
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), self_us, cumulative_us, depth))
+    return rows
+
+
+def startup_report(top=15):
+    """
+    Collect import and startup timings for the app module. Each measurement
+    runs in a fresh interpreter so nothing is already imported.
+    """
+    # Modules the bare interpreter loads anyway (site, .pth hooks) aren't ours
+    baseline = {row[0] for row in parse_importtime(_run_python(["-X", "importtime", "-c", "pass"]).stderr)}
+    result = _run_python(["-X", "importtime", "-c", "import app"])
+    rows = [row for row in parse_importtime(result.stderr) if row[0] not in baseline]
+    total = next((cumulative for name, _, cumulative, _ in reversed(rows) if name == "app"), None)
+
+    # Only direct imports of app.py, so nested modules aren't counted twice
+    direct = [row for row in rows if row[3] == 1]
+    timing = _run_python(["-c", TIMING_SCRIPT % (LAZY_MODULES,)])
+    try:
+        timings = json.loads(timing.stdout.strip().splitlines()[-1])
+    except (IndexError, json.JSONDecodeError):
+        timings = {"error": (timing.stderr or timing.stdout).strip()[-500:]}
+
+    return {
+        "app_import_us": total,
+        "slowest_imports": [
+            {"module": name, "self_us": self_us, "cumulative_us": cumulative}
+            for name, self_us, cumulative, _ in sorted(direct, key=lambda row: -row[2])[:top]
+        ],
+        "slowest_modules_self": [
+            {"module": name, "self_us": self_us}
+            for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:top]
+        ],
+        **timings,
+    }
+
+
+def print_report(report):
+    print("Startup report")
+    print("==============")
+    if report.get("app_import_us") is not None:
+        print(f"import app (-X importtime): {report['app_import_us'] / 1000:.1f} ms")
+    if "import_ms" in report:
+        print(f"import app (wall clock):    {report['import_ms']:.1f} ms")
+        print(f"create_app():               {report['create_app_ms']:.1f} ms")
+        print(f"first request (/login):     {report['first_request_ms']:.1f} ms")
+    if report.get("error"):
+        print(f"timing run failed: {report['error']}")
+
+    print("\nSlowest imports from app.py (cumulative):")
+    for row in report["slowest_imports"]:
+        print(f"  {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+
+    print("\nSlowest single modules (self time):")
+    for row in report["slowest_modules_self"]:
+        print(f"  {row['self_us'] / 1000:8.1f} ms  {row['module']}")
+
+    eager = report.get("eager_modules")
+    if eager:
+        print("\nWarning: these should load lazily but were imported at startup: " + ", ".join(eager))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report app import and startup timings (python app.py --startup-report)."
+    )
+    parser.add_argument("--startup-report", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--top", type=int, default=15, help="rows per table (default 15)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = startup_report(top=args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import os
+import json
+import queue
+import threading
+import time
+
+from basecamp_threads import ProcessThread
+
+# Seconds between change checks while anyone is listening
+STATS_STREAM_INTERVAL = float(os.environ.get("STATS_STREAM_INTERVAL", "2"))
+
+# Keep-alive comment so proxies don't drop idle streams (and dead clients are noticed)
+STATS_STREAM_HEARTBEAT = float(os.environ.get("STATS_STREAM_HEARTBEAT", "15"))
+
+# Updates buffered per subscriber before it is resynced with a full snapshot
+STATS_STREAM_BACKLOG = 32
+
+
+def format_sse(data, event="stats"):
+    """Encode one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StatsBroadcaster:
+    """
+    One publisher thread feeding every open stats stream.
+
+    The thread calls `snapshot_func` once per interval (only while there are
+    subscribers), diffs it against the last published snapshot and pushes
+    just the changed keys to each subscriber's queue. Ten open tabs cost the
+    same probes as one.
+    """
+
+    def __init__(self, snapshot_func, interval=STATS_STREAM_INTERVAL, heartbeat=STATS_STREAM_HEARTBEAT):
+        self.snapshot_func = snapshot_func
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._last = {}
+        self._lock = threading.Lock()
+        self._publisher = ProcessThread(self._run, "stats-broadcaster")
+
+    def _ensure_running(self):
+        self._publisher.start()
+
+    def _take_snapshot(self):
+        try:
+            return self.snapshot_func()
+        except Exception:
+            return None
+
+    def _offer(self, q, message):
+        try:
+            q.put_nowait(message)
+        except queue.Full:
+            # Slow reader: throw its backlog away and resync it from scratch
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+            q.put_nowait(dict(self._last, full=True))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._subscribers:
+                    continue
+
+            snapshot = self._take_snapshot()
+            if snapshot is None:
+                continue
+
+            with self._lock:
+                changes = {k: v for k, v in snapshot.items() if self._last.get(k) != v}
+                if not changes:
+                    continue
+                self._last.update(changes)
+                for q in list(self._subscribers):
+                    self._offer(q, changes)
+
+    def subscribe(self):
+        """Register a new listener; its queue starts with a full snapshot."""
+        q = queue.Queue(maxsize=STATS_STREAM_BACKLOG)
+        with self._lock:
+            if not self._subscribers:
+                # Nobody was listening, so the cached snapshot may be old
+                snapshot = self._take_snapshot()
+                if snapshot is not None:
+                    self._last = snapshot
+            self._subscribers.add(q)
+            q.put_nowait(dict(self._last, full=True))
+            self._ensure_running()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def stream(self):
+        """Generator of SSE text for one client, until it disconnects."""
+        q = self.subscribe()
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while True:
+                try:
+                    message = q.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(message)
+        finally:
+            self.unsubscribe(q)
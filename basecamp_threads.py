@@ -0,0 +1,41 @@
+import os
+import threading
+
+
+class ProcessThread:
+    """
+    A daemon thread owned by the process that started it.
+
+    start() is a no-op while the thread runs in this process. A forked
+    child inherits the object but not the thread, so its first start()
+    begins a fresh one there. Background workers call start() lazily
+    (on first use) rather than at import, so gunicorn's preloading master
+    never runs them.
+    """
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        self.pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def running(self):
+        """True if the thread is alive in this process."""
+        return self._thread is not None and self._thread.is_alive() and self.pid == os.getpid()
+
+    def start(self, setup=None):
+        """
+        Start the thread unless it's already running here; `setup()` runs
+        first, under the same lock (e.g. to make a fresh queue for it).
+        Returns True if a thread was started.
+        """
+        with self._lock:
+            if self.running():
+                return False
+            if setup is not None:
+                setup()
+            self.pid = os.getpid()
+            self._thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+            self._thread.start()
+            return True
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Compare two bench.run result files: python -m bench.compare BASE.json NEW.json"""
+import sys
+import json
+import argparse
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare(base, new, metric="median_ms"):
+    """[(case, base_ms, new_ms, change_pct)] for every case in either file."""
+    rows = []
+    names = list(base["cases"]) + [name for name in new["cases"] if name not in base["cases"]]
+    for name in names:
+        a = base["cases"].get(name, {}).get(metric)
+        b = new["cases"].get(name, {}).get(metric)
+        change = round((b - a) / a * 100, 1) if a and b is not None else None
+        rows.append((name, a, b, change))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="median_ms", choices=("median_ms", "p95_ms", "mean_ms", "min_ms", "cold_ms"))
+    args = parser.parse_args(argv)
+
+    base, new = _load(args.base), _load(args.new)
+    if base.get("params") != new.get("params"):
+        print("Warning: the two runs used different datasets; the numbers aren't comparable.\n")
+
+    print(f"{'case':24s} {base.get('label', 'base'):>14s} {new.get('label', 'new'):>14s}   change  ({args.metric})")
+    for name, a, b, change in compare(base, new, args.metric):
+        fmt = lambda v: f"{v:11.2f} ms" if v is not None else f"{'-':>14s}"
+        print(f"{name:24s} {fmt(a)} {fmt(b)}   " + (f"{change:+6.1f}%" if change is not None else "     -"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Synthetic inputs for the benchmark suite.
+
+Everything comes from a seeded RNG, so the same scale and seed give the
+same data on every machine. Workout dates are relative to the day they
+were generated, so the progress view always has a current week to count.
+Generated data lives under the work directory and is reused until the
+parameters change.
+"""
+import os
+import json
+import random
+import shutil
+import time
+from datetime import datetime, timedelta
+
+# Sizes per --scale; "full" is the production-sized run, "small" a quick check
+SCALES = {
+    "small": {
+        "audit_lines": 50_000,
+        "workout_entries": 10_000,
+        "users": 20,
+        "nas_depth": 3,
+        "nas_fanout": 4,
+        "nas_files_per_dir": 20,
+        "thermal_zones": 2,
+        "w1_sensors": 2,
+    },
+    "full": {
+        "audit_lines": 2_000_000,
+        "workout_entries": 300_000,
+        "users": 200,
+        "nas_depth": 5,
+        "nas_fanout": 5,
+        "nas_files_per_dir": 40,
+        "thermal_zones": 4,
+        "w1_sensors": 4,
+    },
+}
+
+# The benchmark logs in as this user; it owns a share of every generated log
+BENCH_USER = "bench"
+
+AUDIT_ACTIONS = (
+    "view_dashboard", "view_dashboard", "view_dashboard", "login", "logout",
+    "view_system_stats", "open_link", "exercise_progress_view", "exercise_logs_view",
+    "office_notify_status", "login_failed",
+)
+
+LINK_TARGETS = ("Music", "File Explorer", "GrowStuff Dashboard", "Router Admin", "Exercise")
+
+NAS_EXTENSIONS = (".mp3", ".flac", ".jpg", ".png", ".mp4", ".mkv", ".pdf", ".docx", ".zip", ".txt", ".bin")
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/139.0 Safari/537.36"
+
+# Bump when a generator's output changes, so cached datasets are rebuilt
+DATASET_VERSION = 1
+
+
+def _users(count):
+    return [BENCH_USER] + [f"user{i:03d}" for i in range(1, count)]
+
+
+def make_audit_log(path, lines, users, rng, end=None):
+    """logs.jsonl with `lines` entries in time order, ending at `end`."""
+    end = end or datetime(2026, 1, 1)
+    step = timedelta(seconds=30)
+    when = end - step * lines
+    chunk = []
+    with open(path, "w") as f:
+        for i in range(lines):
+            when += step
+            action = rng.choice(AUDIT_ACTIONS)
+            details = {"target": rng.choice(LINK_TARGETS)} if action == "open_link" else {}
+            chunk.append(json.dumps({
+                "timestamp": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "username": rng.choice(users),
+                "action": action,
+                "ip": f"192.168.{rng.randrange(0, 4)}.{rng.randrange(2, 254)}",
+                "path": "/",
+                "details": details,
+                "user_agent": USER_AGENT,
+            }))
+            if len(chunk) >= 10_000:
+                f.write("\n".join(chunk) + "\n")
+                chunk = []
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+
+
+def make_workout_log(path, entries, users, rng, end=None):
+    """workout_logs.jsonl spread over the last year, BENCH_USER doing about 1 in 10."""
+    end = end or datetime.now().replace(microsecond=0)
+    lines = []
+    for _ in range(entries):
+        user = BENCH_USER if rng.random() < 0.1 else rng.choice(users)
+        started = end - timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        ended = started + timedelta(minutes=rng.randrange(5, 60))
+        steps = [
+            {"type": "exercise", "name": f"Exercise {rng.randrange(1, 30)}", "reps": rng.randrange(6, 20)}
+            for _ in range(rng.randrange(4, 9))
+        ]
+        lines.append(json.dumps({
+            "user": user,
+            "difficulty": rng.choice(("easy", "medium", "hard")),
+            "focus": rng.choice(("legs", "upper", "mixed")),
+            "started_at": started.isoformat(),
+            "ended_at": ended.isoformat(),
+            "warmups": [],
+            "steps": steps,
+            "rating": rng.randrange(1, 6),
+            "type": "guided",
+        }))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def make_nas_tree(root, depth, fanout, files_per_dir, rng):
+    """A directory tree `fanout` wide and `depth` deep of sparse files (no real disk use)."""
+    count = 0
+    stack = [(root, 0)]
+    while stack:
+        path, level = stack.pop()
+        os.makedirs(path, exist_ok=True)
+        for i in range(files_per_dir):
+            name = f"file{i:03d}{rng.choice(NAS_EXTENSIONS)}"
+            with open(os.path.join(path, name), "wb") as f:
+                f.truncate(rng.randrange(1_000, 50_000_000))
+            count += 1
+        if level < depth:
+            stack.extend((os.path.join(path, f"dir{i}"), level + 1) for i in range(fanout))
+    return count
+
+
+def make_sysfs(root, thermal_zones, w1_sensors, rng):
+    """Thermal zones and DS18B20 w1_slave files laid out like /sys."""
+    for i in range(thermal_zones):
+        zone = os.path.join(root, "class", "thermal", f"thermal_zone{i}")
+        os.makedirs(zone, exist_ok=True)
+        with open(os.path.join(zone, "temp"), "w") as f:
+            f.write(f"{rng.randrange(40_000, 70_000)}\n")
+    for i in range(w1_sensors):
+        device = os.path.join(root, "bus", "w1", "devices", f"28-00000{i:07x}")
+        os.makedirs(device, exist_ok=True)
+        millidegrees = rng.randrange(15_000, 30_000)
+        with open(os.path.join(device, "w1_slave"), "w") as f:
+            f.write("72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n"
+                    f"72 01 4b 46 7f ff 0e 10 57 t={millidegrees}\n")
+
+
+def make_systemctl(bin_dir):
+    """A `systemctl` stand-in on PATH so the service probe never touches the host."""
+    os.makedirs(bin_dir, exist_ok=True)
+    path = os.path.join(bin_dir, "systemctl")
+    with open(path, "w") as f:
+        f.write("""#!/bin/sh
+# Answers `systemctl show --property=... UNIT...` with every unit active
+first=1
+for arg in "$@"; do
+  case "$arg" in
+    -*|show) continue ;;
+  esac
+  [ $first -eq 1 ] || echo
+  first=0
+  echo "Id=$arg"
+  echo "LoadState=loaded"
+  echo "ActiveState=active"
+  echo "SubState=running"
+  echo "ActiveEnterTimestamp=Thu 2026-01-01 00:00:00 UTC"
+  echo "MainPID=4242"
+  echo "MemoryCurrent=52428800"
+done
+""")
+    os.chmod(path, 0o755)
+    return path
+
+
+def make_backup_status(path):
+    with open(path, "w") as f:
+        json.dump({
+            "status": "success",
+            "last_attempt": "2026-01-01 03:00:00",
+            "last_success": "2026-01-01 03:00:00",
+        }, f)
+
+
+def ensure_datasets(workdir, scale="small", seed=1):
+    """
+    Build (or reuse) the pristine datasets for `scale` under `workdir` and
+    return {"dir", "params", "timings"}. Runs copy the mutable files out
+    of here first, so a benchmark never changes the cached inputs.
+    """
+    params = dict(SCALES[scale], seed=seed, version=DATASET_VERSION)
+    data_dir = os.path.join(workdir, f"{scale}-{seed}")
+    stamp_path = os.path.join(data_dir, "params.json")
+    try:
+        with open(stamp_path, "r") as f:
+            info = json.load(f)
+        if info["params"] == params:
+            return info
+    except (OSError, ValueError, KeyError):
+        pass
+
+    shutil.rmtree(data_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+    users = _users(params["users"])
+    timings = {}
+
+    def timed(name, func, *args):
+        started = time.perf_counter()
+        result = func(*args, random.Random(f"{seed}-{name}"))
+        timings[name] = round(time.perf_counter() - started, 2)
+        return result
+
+    timed("audit_log", make_audit_log, os.path.join(data_dir, "logs.jsonl"), params["audit_lines"], users)
+    timed("workout_log", make_workout_log, os.path.join(data_dir, "workout_logs.jsonl"),
+          params["workout_entries"], users)
+    nas_files = timed("nas_tree", make_nas_tree, os.path.join(data_dir, "nasdata"),
+                      params["nas_depth"], params["nas_fanout"], params["nas_files_per_dir"])
+    timed("sysfs", make_sysfs, os.path.join(data_dir, "sys"), params["thermal_zones"], params["w1_sensors"])
+    make_systemctl(os.path.join(data_dir, "bin"))
+    make_backup_status(os.path.join(data_dir, "backup_status.json"))
+
+    info = {"dir": data_dir, "params": params, "timings": timings, "nas_files": nas_files}
+    with open(stamp_path, "w") as f:
+        json.dump(info, f, indent=2)
+    return info
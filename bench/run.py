@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Time the heaviest views against large synthetic datasets, fully offline.
+
+    python -m bench.run                        # quick run on the "small" scale
+    python -m bench.run --scale full --label my-branch
+    python -m bench.compare bench/results/main.json bench/results/my-branch.json
+
+Every input the app reads is redirected by environment variables before
+app.py is imported: the audit log, workout log, NAS tree, sysfs sensors,
+backup status, systemctl (a stub script on PATH) and the office-notify
+device (a local HTTP stub). Mutable files are copied into a scratch
+directory per run, so runs never change the cached datasets or the real
+data next to the app.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+from bench.datasets import BENCH_USER, SCALES, ensure_datasets
+from bench.stubs import OfficeNotifyStub
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Generated datasets (reused between runs) and run scratch space
+DEFAULT_WORKDIR = os.path.join(BENCH_DIR, ".data")
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Seconds to wait for the NAS indexer thread's first pass before timing
+NAS_SETTLE_TIMEOUT = 120
+
+FOCUSES = ("legs", "upper", "mixed")
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def _environment(data_dir, run_dir, notify_url):
+    """Environment overrides pointing every input at the synthetic data."""
+    return {
+        "BASECAMP_LOG_FILE": os.path.join(run_dir, "logs.jsonl"),
+        "BASECAMP_LOG_SEGMENT_DIR": os.path.join(run_dir, "log_segments"),
+        # One big active log, as the request describes, rather than segments
+        "LOG_ROTATE_BYTES": "0",
+        "AUDIT_DB_FILE": os.path.join(run_dir, "audit.db"),
+        "ANALYTICS_FILE": os.path.join(run_dir, "analytics.json"),
+        "NAS_PATH": os.path.join(data_dir, "nasdata"),
+        "NAS_INDEX_FILE": os.path.join(run_dir, "nas_index.json"),
+        "NAS_INDEX_INTERVAL": "86400",
+        "SYSFS_ROOT": os.path.join(data_dir, "sys"),
+        "BACKUP_STATUS_FILE": os.path.join(data_dir, "backup_status.json"),
+        "EXERCISE_DATA_DIR": os.path.join(run_dir, "exercise"),
+        "OFFICE_NOTIFY_BASE": notify_url,
+        "PROFILE_DIR": os.path.join(run_dir, "profiles"),
+        "ASSET_CACHE_DIR": os.path.join(run_dir, "asset_cache"),
+        "PATH": os.path.join(data_dir, "bin") + os.pathsep + os.environ.get("PATH", ""),
+    }
+
+
+def _prepare_run_dir(data_dir, workdir):
+    run_dir = tempfile.mkdtemp(prefix="run-", dir=workdir)
+    shutil.copyfile(os.path.join(data_dir, "logs.jsonl"), os.path.join(run_dir, "logs.jsonl"))
+    os.makedirs(os.path.join(run_dir, "exercise"))
+    shutil.copyfile(os.path.join(data_dir, "workout_logs.jsonl"),
+                    os.path.join(run_dir, "exercise", "workout_logs.jsonl"))
+    return run_dir
+
+
+def _owned_indexes(path, user):
+    """Line numbers of `user`'s workout entries, last first (deleting them in
+    that order keeps the remaining numbers valid)."""
+    owned = []
+    with open(path, "r") as f:
+        for idx, line in enumerate(f):
+            if f'"user": "{user}"' in line:
+                owned.append(idx)
+    owned.reverse()
+    return owned
+
+
+def _git_info():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True,
+                                  timeout=10).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "dirty": bool(status) if status is not None else None}
+
+
+def _summarise(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(ordered[0], 2),
+        "median_ms": round(statistics.median(ordered), 2),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def _cases(owned):
+    """(name, method, path, form-data factory) for each benchmarked view."""
+    pending = iter(owned)
+    counter = iter(range(10 ** 9))
+
+    def delete_form():
+        idx = next(pending, None)
+        if idx is None:
+            raise RuntimeError("ran out of workout entries to delete; use a larger scale or fewer repeats")
+        return {"idx": str(idx)}
+
+    def workout_form():
+        n = next(counter)
+        return {"difficulty": DIFFICULTIES[n % 3], "focus": FOCUSES[n // 3 % 3]}
+
+    return [
+        ("dashboard", "GET", "/?progressive=0", None),
+        ("dashboard_progressive", "GET", "/?progressive=1", None),
+        ("system_stats", "GET", "/system-stats", None),
+        ("exercise.progress", "GET", "/exercise/progress", None),
+        ("exercise.workout_logs", "GET", "/exercise/logs", None),
+        ("generate_workout", "POST", "/exercise/", workout_form),
+        # Mutates the workout log, so it runs after the views that read it
+        ("delete_log", "POST", "/exercise/logs/delete", delete_form),
+        ("office_notify_status", "GET", "/office-notify/status", None),
+    ]
+
+
+def _time_case(client, method, path, form, warmup, repeat):
+    cold = None
+    samples = []
+    errors = 0
+    server_timing = None
+    for i in range(warmup + repeat):
+        data = form() if form else None
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            errors += 1
+        server_timing = response.headers.get("Server-Timing") or server_timing
+        response.close()
+        if i == 0:
+            cold = elapsed
+        if i >= warmup:
+            samples.append(elapsed)
+    return {"cold_ms": round(cold, 2), **_summarise(samples), "errors": errors,
+            "status": response.status_code, "server_timing": server_timing}
+
+
+def _settle_nas_indexer(nas_indexer):
+    """Time a full and an incremental index pass, then let the background thread finish its first one."""
+    started = time.perf_counter()
+    full = nas_indexer.refresh()
+    full_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    nas_indexer.refresh()
+    incremental_ms = (time.perf_counter() - started) * 1000
+
+    before = nas_indexer.snapshot()["indexed_at"]
+    deadline = time.monotonic() + NAS_SETTLE_TIMEOUT
+    while nas_indexer.snapshot()["indexed_at"] == before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return {"full_ms": round(full_ms, 2), "incremental_ms": round(incremental_ms, 2),
+            "dirs": full.get("dir_count")}
+
+
+def run(scale="small", seed=1, repeat=20, warmup=1, workdir=DEFAULT_WORKDIR, only=None, keep=False):
+    """Run the suite and return the results dict."""
+    if "app" in sys.modules:
+        raise RuntimeError("app was imported before the benchmark could point it at the synthetic data")
+
+    os.makedirs(workdir, exist_ok=True)
+    dataset = ensure_datasets(workdir, scale, seed)
+    data_dir = dataset["dir"]
+    run_dir = _prepare_run_dir(data_dir, workdir)
+    stub = OfficeNotifyStub().start()
+    os.environ.update(_environment(data_dir, run_dir, stub.base_url))
+
+    try:
+        started = time.perf_counter()
+        import app as appmod
+        import_ms = (time.perf_counter() - started) * 1000
+
+        from basecamp_logs import audit_writer
+        from basecamp_nas import nas_indexer
+
+        nas = _settle_nas_indexer(nas_indexer)
+
+        client = appmod.app.test_client()
+        with client.session_transaction() as session:
+            session.update(logged_in=True, username=BENCH_USER, name=BENCH_USER, role="admin")
+
+        owned = _owned_indexes(os.path.join(run_dir, "exercise", "workout_logs.jsonl"), BENCH_USER)
+        cases = {}
+        for name, method, path, form in _cases(owned):
+            if only and name not in only:
+                continue
+            cases[name] = _time_case(client, method, path, form, warmup, repeat)
+            print(f"  {name:24s} median {cases[name]['median_ms']:9.2f} ms   p95 {cases[name]['p95_ms']:9.2f} ms"
+                  f"   cold {cases[name]['cold_ms']:9.2f} ms", flush=True)
+        audit_writer.flush()
+    finally:
+        stub.stop()
+        if not keep:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_info(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "params": dataset["params"],
+        "dataset_build_seconds": dataset["timings"],
+        "repeat": repeat,
+        "warmup": warmup,
+        "app_import_ms": round(import_ms, 2),
+        "nas_walk": nas,
+        "cases": cases,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard and exercise views on synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20, help="timed requests per view (default 20)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests per view first (default 1)")
+    parser.add_argument("--only", action="append", metavar="CASE", help="run just this case (repeatable)")
+    parser.add_argument("--label", help="name for this run, e.g. the branch (default: git branch)")
+    parser.add_argument("--out", help="results file (default bench/results/<label>-<scale>.json)")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where datasets are generated and cached")
+    parser.add_argument("--keep", action="store_true", help="keep the run's scratch directory")
+    args = parser.parse_args(argv)
+
+    print(f"Benchmarking on the {args.scale!r} dataset (generated once under {args.workdir})", flush=True)
+    results = run(args.scale, args.seed, args.repeat, args.warmup, args.workdir, args.only, args.keep)
+    results["label"] = args.label or (results["git"]["branch"] or "run")
+
+    out = args.out or os.path.join(DEFAULT_RESULTS_DIR, f"{results['label'].replace('/', '_')}-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Local stand-ins for the network devices the app talks to."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _OfficeNotifyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            self._reply(200, {"ok": True, "msg": self.server.last_msg, "uptime": 12345})
+        elif url.path == "/notify":
+            self.server.last_msg = (parse_qs(url.query).get("msg") or [None])[0]
+            self.server.sent += 1
+            self._reply(200, {"ok": True})
+        else:
+            self._reply(404, {"ok": False})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OfficeNotifyStub:
+    """The ESP32 office-notify HTTP API (/status, /notify) on 127.0.0.1, on a free port."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _OfficeNotifyHandler)
+        self.server.daemon_threads = True
+        self.server.last_msg = None
+        self.server.sent = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="office-notify-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
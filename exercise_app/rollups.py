@@ -0,0 +1,226 @@
+import os
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from basecamp_locking import atomic_write, file_lock
+from basecamp_perf import perf
+
+# Kept next to the workout log it summarises
+ROLLUP_FILENAME = "workout_rollups.json"
+
+# Bump when the rollup layout changes, so old files are rebuilt
+ROLLUP_VERSION = 1
+
+
+def duration_minutes(start_iso, end_iso):
+    """Whole minutes between two ISO timestamps; 0 if either is invalid or end < start."""
+    try:
+        start = datetime.fromisoformat(start_iso)
+        end = datetime.fromisoformat(end_iso)
+        if end < start:
+            return 0
+        return int((end - start).total_seconds() // 60)
+    except Exception:
+        return 0
+
+
+def _contribution(entry):
+    """(user key, "YYYY-MM-DD", minutes) for an entry that counts towards progress, else None."""
+    try:
+        user = entry.get("user")
+        if not (isinstance(user, str) and user):
+            return None
+        start_iso = entry.get("started_at")
+        minutes = duration_minutes(start_iso, entry.get("ended_at"))
+        if minutes <= 0:
+            return None
+        return user.lower(), datetime.fromisoformat(start_iso).date().isoformat(), minutes
+    except Exception:
+        return None
+
+
+def _signature(path):
+    """Identifies one version of the log: (inode, size, mtime_ns), or None if it's missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+class WorkoutRollups:
+    """
+    Per-user daily workout minutes, persisted beside the workout log.
+
+    Layout: {user: {"days": {"YYYY-MM-DD": [minutes, count]},
+    "months": {"YYYY-MM": [...]}, "total": [...]}}, with user names
+    lowercased. Only entries with a positive duration are counted, as the
+    progress page always has. The file records the log's signature;
+    appends and deletes update both under the log's exclusive lock, and a
+    reader that finds the signature doesn't match (a hand edit, a crash
+    between the two writes, a missing file) rebuilds from the JSONL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # log path -> (rollup file signature, parsed rollup)
+        self._cache = {}
+
+    @staticmethod
+    def path_for(log_path):
+        return os.path.join(os.path.dirname(log_path), ROLLUP_FILENAME)
+
+    # ───────── Building ─────────
+    @staticmethod
+    def _add(users, contribution, sign=1):
+        user, day, minutes = contribution
+        data = users.setdefault(user, {"days": {}, "months": {}, "total": [0, 0]})
+        buckets = (data["days"], day), (data["months"], day[:7])
+        for table, key in buckets:
+            bucket = table.setdefault(key, [0, 0])
+            bucket[0] += sign * minutes
+            bucket[1] += sign
+            if bucket[1] <= 0:
+                del table[key]
+        data["total"][0] += sign * minutes
+        data["total"][1] += sign
+        if data["total"][1] <= 0:
+            del users[user]
+
+    def _build(self, lines):
+        users = {}
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            contribution = _contribution(entry) if isinstance(entry, dict) else None
+            if contribution:
+                self._add(users, contribution)
+        return users
+
+    def rebuild(self, log_path):
+        """Recompute the rollup from the JSONL and save it; returns the users table."""
+        with perf.timer("rollup_rebuild"):
+            with file_lock(log_path, exclusive=False):
+                signature = _signature(log_path)
+                try:
+                    with open(log_path, "r") as f:
+                        users = self._build(f)
+                except FileNotFoundError:
+                    users = {}
+                self._save(log_path, signature, users)
+        return users
+
+    # ───────── Files ─────────
+    def _save(self, log_path, signature, users):
+        data = {"version": ROLLUP_VERSION, "source": signature, "users": users}
+        try:
+            atomic_write(self.path_for(log_path), json.dumps(data, separators=(",", ":")))
+        except OSError:
+            # Still usable for this request; the next reader retries the write
+            pass
+        with self._lock:
+            self._cache.pop(log_path, None)
+
+    def _load(self, log_path):
+        """The saved rollup, parsed once per version of the rollup file; None if unreadable."""
+        path = self.path_for(log_path)
+        file_signature = _signature(path)
+        if file_signature is None:
+            return None
+        with self._lock:
+            cached = self._cache.get(log_path)
+        if cached and cached[0] == file_signature:
+            return cached[1]
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != ROLLUP_VERSION:
+            return None
+        with self._lock:
+            self._cache[log_path] = (file_signature, data)
+        return data
+
+    # ───────── Updates (caller holds the log's exclusive lock) ─────────
+    @staticmethod
+    def signature(log_path):
+        return _signature(log_path)
+
+    def record(self, log_path, before, entry, sign=1):
+        """
+        Fold one appended (sign=1) or deleted (sign=-1) entry into the
+        rollup. `before` is the log's signature before the write; if the
+        saved rollup wasn't in step with it, leave it stale for the next
+        reader to rebuild rather than guess.
+        """
+        data = self._load(log_path)
+        if data is None or data.get("source") != before:
+            return
+        users = json.loads(json.dumps(data["users"]))
+        contribution = _contribution(entry) if isinstance(entry, dict) else None
+        if contribution:
+            self._add(users, contribution, sign)
+        self._save(log_path, _signature(log_path), users)
+
+    # ───────── Queries ─────────
+    def user(self, log_path, user):
+        """{"days", "months", "total"} for `user` (any case), rebuilding the rollup if stale."""
+        if not user:
+            return None
+        data = self._load(log_path)
+        if data is not None and data.get("source") == _signature(log_path):
+            users = data["users"]
+        else:
+            users = self.rebuild(log_path)
+        return users.get(user.lower())
+
+    def progress(self, log_path, user, now, days=7):
+        """
+        Counters for the progress page ({"all"|"week"|"month"|"year":
+        {"minutes", "count"}}) and minutes for each of the last `days` days,
+        oldest first.
+        """
+        data = self.user(log_path, user) or {"days": {}, "months": {}, "total": [0, 0]}
+        by_day, by_month = data["days"], data["months"]
+
+        def total(buckets):
+            minutes = count = 0
+            for bucket in buckets:
+                if bucket:
+                    minutes += bucket[0]
+                    count += bucket[1]
+            return {"minutes": minutes, "count": count}
+
+        # "This week" has always meant the current ISO week number within the
+        # current calendar year, so look up every date that matches both
+        week = now.isocalendar()[1]
+        week_days = []
+        for iso_year in (now.year - 1, now.year, now.year + 1):
+            for weekday in range(1, 8):
+                try:
+                    day = date.fromisocalendar(iso_year, week, weekday)
+                except ValueError:
+                    continue
+                if day.year == now.year:
+                    week_days.append(day.isoformat())
+
+        counters = {
+            "all": {"minutes": data["total"][0], "count": data["total"][1]},
+            "week": total(by_day.get(key) for key in week_days),
+            "month": total([by_month.get(f"{now.year:04d}-{now.month:02d}")]),
+            "year": total(by_month.get(f"{now.year:04d}-{month:02d}") for month in range(1, 13)),
+        }
+        past = []
+        for i in range(days - 1, -1, -1):
+            day = now - timedelta(days=i)
+            past.append((day, (by_day.get(day.strftime("%Y-%m-%d")) or [0, 0])[0]))
+        return counters, past
+
+
+workout_rollups = WorkoutRollups()
@@ -1,21 +1,25 @@
 import os
 import random
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 from flask import render_template, request, redirect, url_for, session, current_app
 
 from . import exercise_bp
 from .storage import (
     ensure_data_files,
     load_json,
-    save_json,
+    update_json,
     append_workout_log,
+    read_workout_log,
+    delete_workout_log,
     load_difficulty_config,
     save_difficulty_config,
     load_settings,
     save_settings,
 )
 from .generate import generate_workout
+from .rollups import duration_minutes, workout_rollups
 
 # Import existing helpers from main app.py
 # IMPORTANT: this assumes your main file is named app.py and module name is "app"
@@ -26,7 +30,9 @@ from basecamp_core import login_required, admin_required, log_action, BASE_DIR
 WARMUP_CATEGORY_OPTIONS = ["cardio", "upper", "legs", "full-body", "mobility", "core", "stretch", "mixed"]
 
 
+@lru_cache(maxsize=1)
 def _paths():
+    # Data files are created once, when the blueprint is registered at startup
     data_dir = ensure_data_files(BASE_DIR)
     exercises_path = os.path.join(data_dir, "exercises.json")
     warmups_path = os.path.join(data_dir, "warmups.json")
@@ -34,6 +40,9 @@ def _paths():
     config_path = os.path.join(data_dir, "settings.json")
     return exercises_path, warmups_path, log_path, config_path
 
+
+exercise_bp.record_once(lambda state: _paths())
+
 def _get_logged_in_name():
     return session.get("name") or session.get("username") or "User"
 
@@ -108,14 +117,7 @@ def _format_timestamp(ts: str):
 
 
 def _calc_duration_minutes(start_iso: str, end_iso: str):
-    try:
-        start = datetime.fromisoformat(start_iso)
-        end = datetime.fromisoformat(end_iso)
-        if end < start:
-            return 0
-        return int((end - start).total_seconds() // 60)
-    except Exception:
-        return 0
+    return duration_minutes(start_iso, end_iso)
 
 @exercise_bp.route("/", methods=["GET", "POST"])
 @login_required
@@ -288,38 +290,33 @@ def workout_logs():
     _, _, log_path, _ = _paths()
     logs = []
     current_user = session.get("name") or session.get("username")
-    if os.path.exists(log_path):
+    for idx, line in enumerate(read_workout_log(log_path)):
+        if not line.strip():
+            continue
         try:
-            with open(log_path, "r") as f:
-                for idx, line in enumerate(f):
-                    if not line.strip():
-                        continue
-                    try:
-                        entry = json.loads(line)
-                        entry["started_display"] = _format_timestamp(entry.get("started_at"))
-                        entry["ended_display"] = _format_timestamp(entry.get("ended_at"))
-                        entry["duration_minutes"] = _calc_duration_minutes(entry.get("started_at"), entry.get("ended_at"))
-                        entry["type"] = entry.get("type") or "guided"
-                        entry["name"] = entry.get("name")
-                        entry["notes"] = entry.get("notes")
-                        entry["_idx"] = idx
-                        try:
-                            entry["started_day"] = datetime.fromisoformat(entry.get("started_at")).strftime("%A")
-                            entry["started_date"] = datetime.fromisoformat(entry.get("started_at")).strftime("%d/%m/%y")
-                            entry["started_time"] = datetime.fromisoformat(entry.get("started_at")).strftime("%H:%M")
-                            entry["ended_time"] = datetime.fromisoformat(entry.get("ended_at")).strftime("%H:%M") if entry.get("ended_at") else ""
-                        except Exception:
-                            entry["started_day"] = ""
-                            entry["started_date"] = ""
-                            entry["started_time"] = ""
-                            entry["ended_time"] = ""
-                        entry_user = entry.get("user")
-                        if entry_user and current_user and entry_user.lower() == current_user.lower():
-                            logs.append(entry)
-                    except json.JSONDecodeError:
-                        continue
-        except OSError:
-            pass
+            entry = json.loads(line)
+            entry["started_display"] = _format_timestamp(entry.get("started_at"))
+            entry["ended_display"] = _format_timestamp(entry.get("ended_at"))
+            entry["duration_minutes"] = _calc_duration_minutes(entry.get("started_at"), entry.get("ended_at"))
+            entry["type"] = entry.get("type") or "guided"
+            entry["name"] = entry.get("name")
+            entry["notes"] = entry.get("notes")
+            entry["_idx"] = idx
+            try:
+                entry["started_day"] = datetime.fromisoformat(entry.get("started_at")).strftime("%A")
+                entry["started_date"] = datetime.fromisoformat(entry.get("started_at")).strftime("%d/%m/%y")
+                entry["started_time"] = datetime.fromisoformat(entry.get("started_at")).strftime("%H:%M")
+                entry["ended_time"] = datetime.fromisoformat(entry.get("ended_at")).strftime("%H:%M") if entry.get("ended_at") else ""
+            except Exception:
+                entry["started_day"] = ""
+                entry["started_date"] = ""
+                entry["started_time"] = ""
+                entry["ended_time"] = ""
+            entry_user = entry.get("user")
+            if entry_user and current_user and entry_user.lower() == current_user.lower():
+                logs.append(entry)
+        except json.JSONDecodeError:
+            continue
 
     logs.sort(key=lambda x: x.get("started_at") or "", reverse=True)
     log_action(username, "exercise_logs_view")
@@ -341,23 +338,17 @@ def delete_log():
     if not os.path.exists(log_path):
         return redirect(url_for("exercise.workout_logs", msg="Log file missing"))
 
+    def owned_by_current_user(entry):
+        entry_user = entry.get("user")
+        return bool(entry_user and current_user and entry_user.lower() == current_user.lower())
+
     try:
-        with open(log_path, "r") as f:
-            lines = f.readlines()
-        if 0 <= idx < len(lines):
-            try:
-                entry = json.loads(lines[idx])
-                entry_user = entry.get("user")
-            except Exception:
-                entry_user = None
-            if entry_user and current_user and entry_user.lower() == current_user.lower():
-                del lines[idx]
-                with open(log_path, "w") as f:
-                    f.writelines(lines)
-                log_action(username, "exercise_log_deleted", {"idx": idx})
-                return redirect(url_for("exercise.workout_logs", msg="Log deleted"))
-            else:
-                return redirect(url_for("exercise.workout_logs", msg="Cannot delete this log"))
+        result = delete_workout_log(log_path, idx, owned_by_current_user)
+        if result == "deleted":
+            log_action(username, "exercise_log_deleted", {"idx": idx})
+            return redirect(url_for("exercise.workout_logs", msg="Log deleted"))
+        if result == "forbidden":
+            return redirect(url_for("exercise.workout_logs", msg="Cannot delete this log"))
     except OSError:
         pass
 
@@ -374,78 +365,17 @@ def progress():
     daily_target = settings.get("daily_target", 15)
     current_user = session.get("name") or session.get("username")
 
-    counters = {
-        "all": {"minutes": 0, "count": 0},
-        "week": {"minutes": 0, "count": 0},
-        "month": {"minutes": 0, "count": 0},
-        "year": {"minutes": 0, "count": 0},
-    }
-
-    if os.path.exists(log_path):
-        try:
-            with open(log_path, "r") as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    try:
-                        entry = json.loads(line)
-                        entry_user = entry.get("user")
-                        if not (entry_user and current_user and entry_user.lower() == current_user.lower()):
-                            continue
-                        start_iso = entry.get("started_at")
-                        end_iso = entry.get("ended_at")
-                        duration = _calc_duration_minutes(start_iso, end_iso)
-                        if duration <= 0:
-                            continue
-                        start_dt = datetime.fromisoformat(start_iso)
-                        counters["all"]["minutes"] += duration
-                        counters["all"]["count"] += 1
-                        if start_dt.isocalendar()[1] == now.isocalendar()[1] and start_dt.year == now.year:
-                            counters["week"]["minutes"] += duration
-                            counters["week"]["count"] += 1
-                        if start_dt.month == now.month and start_dt.year == now.year:
-                            counters["month"]["minutes"] += duration
-                            counters["month"]["count"] += 1
-                        if start_dt.year == now.year:
-                            counters["year"]["minutes"] += duration
-                            counters["year"]["count"] += 1
-                    except Exception:
-                        continue
-        except OSError:
-            pass
+    # Counters and the 7-day view come from the per-user daily rollup
+    # rather than re-reading the whole workout log
+    counters, days = workout_rollups.progress(log_path, current_user, now)
 
     log_action(username, "exercise_progress_view")
-    # Build a 7-day streak/goal view
-    past_days = []
-    for i in range(6, -1, -1):
-        day = now - timedelta(days=i)
-        day_key = day.strftime("%Y-%m-%d")
-        minutes = 0
-        if os.path.exists(log_path):
-            try:
-                with open(log_path, "r") as f:
-                    for line in f:
-                        if not line.strip():
-                            continue
-                        entry = json.loads(line)
-                        entry_user = entry.get("user")
-                        if not (entry_user and current_user and entry_user.lower() == current_user.lower()):
-                            continue
-                        start_iso = entry.get("started_at")
-                        end_iso = entry.get("ended_at")
-                        if not start_iso or not end_iso:
-                            continue
-                        entry_day = start_iso.split("T")[0]
-                        if entry_day == day_key:
-                            minutes += _calc_duration_minutes(start_iso, end_iso)
-            except Exception:
-                pass
-        past_days.append({
-            "label": day.strftime("%A - %d/%m/%y"),
-            "minutes": minutes,
-            "target": daily_target,
-            "over": minutes - daily_target,
-        })
+    past_days = [{
+        "label": day.strftime("%A - %d/%m/%y"),
+        "minutes": minutes,
+        "target": daily_target,
+        "over": minutes - daily_target,
+    } for day, minutes in days]
 
     return render_template("exercise/progress.html", counters=counters, past_days=past_days, daily_target=daily_target)
 
@@ -508,11 +438,11 @@ def admin_exercises():
     daily_target = settings.get("daily_target", 15)
 
     if request.method == "POST":
-        # Add, update or delete
+        # Add, update or delete; each edit re-reads the file under its lock,
+        # so a concurrent edit from another admin or worker isn't lost
         if request.form.get("delete") == "1":
             name = request.form.get("name")
-            exercises = [e for e in exercises if e.get("name") != name]
-            save_json(exercises_path, exercises)
+            update_json(exercises_path, lambda exercises: [e for e in exercises if e.get("name") != name], [])
             log_action(username, "exercise_admin_exercise_deleted", {"name": name})
             return redirect(url_for("exercise.admin_exercises", msg="Exercise deleted"))
         elif request.form.get("update") == "1":
@@ -524,15 +454,17 @@ def admin_exercises():
             timer_seconds_val = request.form.get("timer_seconds")
             timer_seconds = int(timer_seconds_val) if timer_seconds_val else None
 
-            for ex in exercises:
-                if ex.get("name") == original_name:
-                    ex["name"] = name or original_name
-                    ex["focus"] = focus if focus in ("legs", "upper", "mixed") else "mixed"
-                    ex["difficulty_allowed"] = [d for d in allowed if d in ("easy", "medium", "hard")] or ["easy", "medium", "hard"]
-                    ex["description"] = description
-                    ex["timer_seconds"] = timer_seconds
-                    break
-            save_json(exercises_path, exercises)
+            def update(exercises):
+                for ex in exercises:
+                    if ex.get("name") == original_name:
+                        ex["name"] = name or original_name
+                        ex["focus"] = focus if focus in ("legs", "upper", "mixed") else "mixed"
+                        ex["difficulty_allowed"] = [d for d in allowed if d in ("easy", "medium", "hard")] or ["easy", "medium", "hard"]
+                        ex["description"] = description
+                        ex["timer_seconds"] = timer_seconds
+                        break
+                return exercises
+            update_json(exercises_path, update, [])
             log_action(username, "exercise_admin_exercise_updated", {"name": name})
             return redirect(url_for("exercise.admin_exercises", msg="Exercise updated"))
         else:
@@ -544,14 +476,14 @@ def admin_exercises():
             timer_seconds = int(timer_seconds_val) if timer_seconds_val else None
 
             if name:
-                exercises.append({
+                exercise = {
                     "name": name,
                     "focus": focus if focus in ("legs", "upper", "mixed") else "mixed",
                     "difficulty_allowed": [d for d in allowed if d in ("easy", "medium", "hard")] or ["easy", "medium", "hard"],
                     "description": description,
                     "timer_seconds": timer_seconds,
-                })
-                save_json(exercises_path, exercises)
+                }
+                update_json(exercises_path, lambda exercises: exercises + [exercise], [])
                 log_action(username, "exercise_admin_exercise_added", {"name": name})
                 return redirect(url_for("exercise.admin_exercises", msg="Exercise added"))
 
@@ -567,10 +499,10 @@ def admin_warmups():
     warmups = [_normalize_warmup(w) for w in load_json(warmups_path, [])]
 
     if request.method == "POST":
+        # As with exercises, every edit is one locked read-modify-write
         if request.form.get("delete") == "1":
             name = request.form.get("name")
-            warmups = [w for w in warmups if w.get("name") != name]
-            save_json(warmups_path, warmups)
+            update_json(warmups_path, lambda warmups: [_normalize_warmup(w) for w in warmups if w.get("name") != name], [])
             log_action(username, "exercise_admin_warmup_deleted", {"name": name})
             return redirect(url_for("exercise.admin_warmups", msg="Warm-up deleted"))
         elif request.form.get("update") == "1":
@@ -580,14 +512,17 @@ def admin_warmups():
             categories = request.form.getlist("categories") or ["full-body"]
             duration = int(request.form.get("duration_seconds") or "60")
 
-            for w in warmups:
-                if w.get("name") == original_name:
-                    w["name"] = name or original_name
-                    w["description"] = description
-                    w["categories"] = categories
-                    w["duration_seconds"] = duration
-                    break
-            save_json(warmups_path, warmups)
+            def update(warmups):
+                warmups = [_normalize_warmup(w) for w in warmups]
+                for w in warmups:
+                    if w.get("name") == original_name:
+                        w["name"] = name or original_name
+                        w["description"] = description
+                        w["categories"] = categories
+                        w["duration_seconds"] = duration
+                        break
+                return warmups
+            update_json(warmups_path, update, [])
             log_action(username, "exercise_admin_warmup_updated", {"name": name})
             return redirect(url_for("exercise.admin_warmups", msg="Warm-up updated"))
         else:
@@ -596,8 +531,8 @@ def admin_warmups():
             categories = request.form.getlist("categories") or ["full-body"]
             duration = int(request.form.get("duration_seconds") or "60")
             if name:
-                warmups.append({"name": name, "description": description, "categories": categories, "duration_seconds": duration})
-                save_json(warmups_path, warmups)
+                warmup = {"name": name, "description": description, "categories": categories, "duration_seconds": duration}
+                update_json(warmups_path, lambda warmups: [_normalize_warmup(w) for w in warmups] + [warmup], [])
                 log_action(username, "exercise_admin_warmup_added", {"name": name})
                 return redirect(url_for("exercise.admin_warmups", msg="Warm-up added"))
 
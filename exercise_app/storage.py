@@ -1,6 +1,20 @@
 import os
 import json
+
+from basecamp_locking import (
+    atomic_write,
+    file_lock,
+    read_json_locked,
+    read_lines_locked,
+    update_json_locked,
+    write_json_locked,
+)
+from basecamp_perf import perf
 from .defaults import DEFAULT_EXERCISES, DEFAULT_WARMUPS, DEFAULT_DIFFICULTY_CONFIG
+from .rollups import workout_rollups
+
+# Where the exercise JSON files and workout log live; point elsewhere for testing
+EXERCISE_DATA_DIR = os.environ.get("EXERCISE_DATA_DIR")
 
 DEFAULT_SETTINGS = {
     "difficulty_config": DEFAULT_DIFFICULTY_CONFIG,
@@ -9,7 +23,7 @@ DEFAULT_SETTINGS = {
 
 
 def ensure_data_files(base_dir: str) -> str:
-    data_dir = os.path.join(base_dir, "exercise_app", "data")
+    data_dir = EXERCISE_DATA_DIR or os.path.join(base_dir, "exercise_app", "data")
     os.makedirs(data_dir, exist_ok=True)
 
     exercises_path = os.path.join(data_dir, "exercises.json")
@@ -17,53 +31,92 @@ def ensure_data_files(base_dir: str) -> str:
     workout_log_path = os.path.join(data_dir, "workout_logs.jsonl")
     config_path = os.path.join(data_dir, "settings.json")
 
-    if not os.path.exists(exercises_path):
-        with open(exercises_path, "w") as f:
-            json.dump(DEFAULT_EXERCISES, f, indent=2)
-
-    if not os.path.exists(warmups_path):
-        with open(warmups_path, "w") as f:
-            json.dump(DEFAULT_WARMUPS, f, indent=2)
-
-    if not os.path.exists(workout_log_path):
-        # JSON Lines file makes it easy to append
-        with open(workout_log_path, "w") as f:
-            f.write("")
-
-    if not os.path.exists(config_path):
-        with open(config_path, "w") as f:
-            json.dump(DEFAULT_SETTINGS, f, indent=2)
+    # Workers bootstrap concurrently: create each default under its lock,
+    # so one never overwrites a file another has just created (or saved to)
+    for path, default in ((exercises_path, DEFAULT_EXERCISES),
+                          (warmups_path, DEFAULT_WARMUPS),
+                          (config_path, DEFAULT_SETTINGS)):
+        if not os.path.exists(path):
+            with file_lock(path):
+                if not os.path.exists(path):
+                    atomic_write(path, json.dumps(default, indent=2))
+
+    # JSON Lines file makes it easy to append; "a" creates it without
+    # truncating entries another worker may already have appended
+    with open(workout_log_path, "a"):
+        pass
 
     return data_dir
 
 
 def load_json(path: str, fallback):
-    try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except Exception:
-        return fallback
+    return read_json_locked(path, fallback)
 
 
 def save_json(path: str, data):
-    tmp_path = path + ".tmp"
-    with open(tmp_path, "w") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp_path, path)
+    write_json_locked(path, data)
+
+
+def update_json(path: str, change, fallback):
+    """Apply `change` to the file's data under one exclusive lock (see update_json_locked)."""
+    return update_json_locked(path, change, fallback)
+
+
+def read_workout_log(path: str):
+    """
+    Return the raw lines of the workout log (shared lock, so a concurrent
+    delete can't be seen half-written).
+    """
+    try:
+        with perf.timer("workout_log"):
+            return read_lines_locked(path)
+    except OSError:
+        return []
 
 
 def append_workout_log(path: str, entry: dict):
     """
-    Append a single workout log entry to the JSONL file.
+    Append a single workout log entry to the JSONL file, and fold it into
+    the per-user rollup under the same exclusive lock.
     """
     try:
-        with open(path, "a") as f:
-            f.write(json.dumps(entry) + "\n")
+        with file_lock(path):
+            before = workout_rollups.signature(path)
+            with open(path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            workout_rollups.record(path, before, entry)
     except OSError:
         # Don't crash the flow if logging fails
         pass
 
 
+def delete_workout_log(path: str, idx: int, can_delete):
+    """
+    Remove line `idx` from the workout log if `can_delete(entry)` allows it.
+    The read, check, rewrite and rollup update happen under one exclusive
+    lock, so appends and deletes from other workers aren't lost. Returns
+    "deleted", "forbidden" or "missing".
+    """
+    with file_lock(path):
+        before = workout_rollups.signature(path)
+        try:
+            with open(path, "r") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            lines = []
+        if not 0 <= idx < len(lines):
+            return "missing"
+        try:
+            entry = json.loads(lines[idx])
+        except Exception:
+            entry = None
+        if entry is None or not can_delete(entry):
+            return "forbidden"
+        atomic_write(path, "".join(lines[:idx] + lines[idx + 1:]))
+        workout_rollups.record(path, before, entry, sign=-1)
+    return "deleted"
+
+
 def load_difficulty_config(path: str):
     data = load_json(path, DEFAULT_SETTINGS)
     cfg = data.get("difficulty_config") or DEFAULT_DIFFICULTY_CONFIG
@@ -79,9 +132,10 @@ def load_difficulty_config(path: str):
 
 
 def save_difficulty_config(path: str, config: dict):
-    current = load_json(path, DEFAULT_SETTINGS)
-    current["difficulty_config"] = config
-    save_json(path, current)
+    def change(current):
+        current["difficulty_config"] = config
+        return current
+    update_json(path, change, DEFAULT_SETTINGS)
 
 
 def load_settings(path: str):
@@ -0,0 +1,90 @@
+# Production settings for `gunicorn -c gunicorn.conf.py wsgi:app`.
+# Every value can be overridden with the environment variable next to it.
+#
+# Thread and fork safety
+# ──────────────────────
+# The background threads (stats sampler, sensor reader, NAS indexer, audit
+# log writer, analytics checkpointer, office-notify sender/prober and the
+# stats stream publisher) are started lazily on first use and record the
+# pid that started them. With preload_app the master imports the app but
+# never serves a request, so no threads exist before the fork; each worker
+# starts its own on demand, and anything inherited from a parent (queued
+# log entries, HTTP sessions, SQLite connections) is discarded when the pid
+# changes.
+#
+# Shared state between workers goes through files, each safe for several
+# writers: logs.jsonl (appends of whole batches), its sidecar index and
+# analytics.json (flock), audit.db (SQLite WAL + busy_timeout),
+# nas_index.json, stats_sample.json and ds18b20_readings.json (only the
+# worker holding the matching .lock walks the NAS, samples CPU/temperatures
+# or reads the 1-Wire bus; the rest load what it writes and one of them
+# takes over if it exits), office_notify_deliveries.json and profiles/armed.json (flock), users.json
+# and the exercise data (flock + atomic rename, re-read when they change).
+#
+# Everything else is per worker, and what a request sees depends on which
+# worker answers it:
+#   - /perf histograms and Server-Timing, /api/compression counters and lock
+#     wait stats (a reset clears only the worker that took the request)
+#   - the office-notify circuit breaker and status cache (each worker
+#     notices the device is offline on its own), and its send queue: a
+#     message is retried only by the worker that accepted it, so it is lost
+#     if that worker is recycled first
+#   - the sample history (each follower appends the leader's samples from
+#     when it started, so values agree within a sample interval), the
+#     systemctl cache and the SSE publisher
+#   - the fragment cache and the parsed copies of users.json, the log index
+#     and the workout rollups (caches of shared files, never the source)
+#
+# max_requests recycling ends a worker and its daemon threads without
+# warning. Anything those threads leave half-done on disk is finished by the
+# next worker: an interrupted log rotation is compressed by the next audit
+# writer to start.
+#
+# Workers use gthread so one worker can hold several /api/stats/stream SSE
+# connections open; each open tab keeps one thread busy, so size
+# workers * threads for the number of tabs plus normal traffic.
+import os
+import multiprocessing
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# One worker per core (four on a Pi 4/5)
+workers = int(os.environ.get("GUNICORN_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# Import the app once in the master and fork it (faster start, shared pages)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# A worker silent for this long is restarted. gthread workers heartbeat from
+# their main loop, so this does not limit a single request: a stuck handler
+# only ties up its own thread. There is deliberately no per-request limit
+# (gunicorn has none for threads, and SSE responses are meant to stay open);
+# slow probes are bounded inside the app by the stats collectors' deadlines.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "10"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to cap memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "5000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "500"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", None)
+errorlog = os.environ.get("GUNICORN_ERROR_LOG", "-")
+
+
+def on_starting(server):
+    # Fingerprint and precompress static/ once in the master, so workers
+    # don't each compress the same files on their first requests
+    from basecamp_assets import static_assets
+
+    static_assets.build()
+
+
+def worker_exit(server, worker):
+    # Write out anything still queued for the audit log before the worker goes
+    from basecamp_core import audit_writer
+    from basecamp_analytics import audit_rollups
+
+    audit_writer.flush()
+    audit_rollups.checkpoint()
@@ -0,0 +1,57 @@
+// Live stats pushed from /api/stats/stream. Elements opt in with
+// data-stat="cpu_usage|cpu_temp|case_temp" and data-service-unit="<unit>".
+document.addEventListener("DOMContentLoaded", () => {
+  if (!window.EventSource) return;
+
+  const source = new EventSource("/api/stats/stream");
+  source.addEventListener("stats", (event) => {
+    let data;
+    try {
+      data = JSON.parse(event.data);
+    } catch (e) {
+      return;
+    }
+    applyLiveStats(data);
+    document.dispatchEvent(new CustomEvent("live-stats", { detail: data }));
+  });
+});
+
+function setStatText(name, text) {
+  document.querySelectorAll(`[data-stat="${name}"]`).forEach((el) => {
+    el.textContent = text;
+  });
+}
+
+function applyLiveStats(data) {
+  if ("cpu_usage" in data) {
+    setStatText("cpu_usage", data.cpu_usage === null ? "Unknown" : `${data.cpu_usage}%`);
+  }
+
+  if ("cpu_temp" in data) {
+    const temp = data.cpu_temp || {};
+    document.querySelectorAll('[data-stat="cpu_temp"]').forEach((el) => {
+      el.textContent = "";
+      if (temp.temperature === null || temp.temperature === undefined) {
+        el.textContent = "Unknown";
+        return;
+      }
+      el.appendChild(document.createTextNode(`${temp.temperature}°C `));
+      const badge = document.createElement("span");
+      badge.className = `status-badge ${temp.status}`;
+      badge.textContent = temp.label;
+      el.appendChild(badge);
+    });
+  }
+
+  if ("case_temp" in data) {
+    setStatText("case_temp", data.case_temp === null ? "Not detected" : `${data.case_temp}°C`);
+  }
+
+  if ("services" in data && data.services) {
+    Object.entries(data.services).forEach(([unit, status]) => {
+      document.querySelectorAll(`[data-service-unit="${unit}"]`).forEach((dot) => {
+        dot.className = `status-dot status-${status}`;
+      });
+    });
+  }
+}
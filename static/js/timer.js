@@ -1,5 +1,10 @@
+// The page passes the fingerprinted sound URL; only readable while the script runs
+const timerScript = document.currentScript;
+
 document.addEventListener("DOMContentLoaded", () => {
-  const notifyAudio = new Audio("/static/audio/notify.mp3");
+  const notifyAudio = new Audio(
+    (timerScript && timerScript.dataset.notifySrc) || "/static/audio/notify.mp3"
+  );
 
   const timers = document.querySelectorAll(".timer-start");
   timers.forEach((btn) => {
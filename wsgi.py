@@ -0,0 +1,7 @@
+# WSGI entry point for production servers:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# app.py's module-level app is built by create_app(); importing it here
+# (before gunicorn forks, with preload_app) shares the code between workers.
+from app import app, create_app  # noqa: F401